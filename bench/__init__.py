@@ -0,0 +1,8 @@
+"""
+Benchmarks behind the figures quoted in commit messages.
+
+Run them from the repository root, e.g. ``python -m bench.writes``. Each one
+works on its own throwaway SQLite database, so the bot's database is never
+touched. To compare before and after a change, run the same script on a
+checkout of each commit.
+"""
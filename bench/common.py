@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+
+# Size of the seeded tables
+USERS = 50000
+CHATS = 10000
+
+
+def configure(name: str, **env) -> str:
+    """
+    Point the bot's settings at a new SQLite file in a temporary directory and return its path.
+
+    Must run before ``database`` is imported, since its settings are read at import.
+    ``env`` sets other settings unless they are already set in the environment.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_"), f"{name}.sqlite")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    for key, value in env.items():
+        os.environ.setdefault(key, str(value))
+    return path
+
+
+async def seed(users: int = USERS, chats: int = CHATS) -> None:
+    """Create the tables and insert ``users`` users and ``chats`` group chats."""
+    from sqlalchemy import insert
+    from database.database import Chats, Users, create_tables, engine
+    await create_tables()
+    async with engine.begin() as conn:
+        await conn.execute(insert(Users), [dict(user_id=i, username=f"u{i}", full_name=f"User {i}")
+                                           for i in range(1, users + 1)])
+        await conn.execute(insert(Chats), [dict(chat_id=-i, chat_type="group", chat_title=f"Chat {i}")
+                                           for i in range(1, chats + 1)])
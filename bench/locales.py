@@ -0,0 +1,26 @@
+"""
+Locale message lookups per second with Messages and PrivilegesMessages.
+
+    python -m bench.locales [--number 200000]
+"""
+import argparse
+import timeit
+from tools.enums import Messages, PrivilegesMessages
+
+
+def main(number: int) -> None:
+    messages = Messages(language="fr")
+    cases = [
+        ("lookup (cached instance)", lambda: messages.start),
+        ("Messages(lang).attr", lambda: Messages(language="he").help),
+        ("PrivilegesMessages(lang).attr", lambda: PrivilegesMessages(language="he").can_restrict_members),
+    ]
+    for name, lookup in cases:
+        elapsed = timeit.timeit(lookup, number=number)
+        print(f"{name:32s} {number / elapsed / 1e6:6.2f} M lookups/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=200000, help="Lookups per case")
+    main(parser.parse_args().number)
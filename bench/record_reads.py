@@ -0,0 +1,62 @@
+"""
+Latency and retained memory of user and chat reads on the handler path, cached and uncached.
+
+    python -m bench.record_reads [--calls 2000]
+
+Uses Users.get_record/Chats.get_record when the tree has them, else Users.get/Chats.get,
+so the same script measures both sides of the switch to records.
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from bench.common import CHATS, USERS, configure, seed
+
+configure("record_reads")
+
+from database.database import Chats, Users  # noqa: E402
+
+RECORDS = hasattr(Users, "get_record")
+
+
+async def measure(name: str, read, ids, clear) -> None:
+    for entity_id in ids[:50]:
+        await read(entity_id)
+    started = time.perf_counter()
+    for entity_id in ids:
+        if clear:
+            clear()
+        await read(entity_id)
+    per_call = (time.perf_counter() - started) / len(ids)
+
+    # Memory still held by the returned results, as when handlers keep them for the update
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = []
+    for entity_id in ids[:200]:
+        if clear:
+            clear()
+        results.append(await read(entity_id))
+    retained = (tracemalloc.get_traced_memory()[0] - before) / len(results)
+    tracemalloc.stop()
+    print(f"{'record' if RECORDS else 'dict':6s} {name:16s} {per_call * 1e6:8.1f} us/call  {retained:6.0f} B/result")
+
+
+async def main(calls: int) -> None:
+    await seed()
+    read_user = Users.get_record if RECORDS else Users.get
+    read_chat = Chats.get_record if RECORDS else Chats.get
+    rnd = random.Random(2)
+    user_ids = [rnd.randint(1, USERS) for _ in range(calls)]
+    chat_ids = [-rnd.randint(1, CHATS) for _ in range(calls)]
+    await measure("user, uncached", read_user, user_ids, Users._cache.clear)
+    await measure("chat, uncached", read_chat, chat_ids, Chats._cache.clear)
+    await measure("user, cached", read_user, user_ids[:50] * (calls // 50), None)
+    await measure("chat, cached", read_chat, chat_ids[:50] * (calls // 50), None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="Reads per case")
+    asyncio.run(main(parser.parse_args().calls))
@@ -0,0 +1,60 @@
+"""
+Mixed Users.get/Users.update throughput under each SQLITE_PROFILE.
+
+    python -m bench.sqlite_profiles [--ops 2000] [--tasks 8]
+
+Every profile runs in its own process, since the profile is read at import.
+The entity cache is bypassed so every read reaches SQLite.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from bench.common import USERS, configure, seed
+
+PROFILES = ("default", "durable", "performance")
+WRITE_RATIOS = (0.1, 0.5)
+
+
+async def run(profile: str, ops: int, tasks: int) -> None:
+    from database.database import Users, engine
+    await seed()
+    rnd = random.Random(1)
+
+    async def worker(calls: int, write_ratio: float):
+        for _ in range(calls):
+            user_id = rnd.randint(1, USERS)
+            if rnd.random() < write_ratio:
+                await Users.update(user_id, language=rnd.choice(["en", "he", "fr"]))
+            else:
+                Users._cache.clear()
+                await Users.get(user_id)
+
+    for write_ratio in WRITE_RATIOS:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(ops // tasks, write_ratio) for _ in range(tasks)))
+        elapsed = time.perf_counter() - started
+        print(f"{profile:12s} writes={write_ratio:4.0%}  {ops // tasks * tasks / elapsed:7.0f} ops/s")
+    async with engine.connect() as conn:
+        journal_mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+        synchronous = (await conn.exec_driver_sql("PRAGMA synchronous")).scalar()
+    print(f"{'':12s} journal_mode={journal_mode} synchronous={synchronous}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000, help="Operations per write ratio")
+    parser.add_argument("--tasks", type=int, default=8, help="Concurrent tasks")
+    parser.add_argument("--profile", choices=PROFILES, help="Run a single profile in this process")
+    args = parser.parse_args()
+    if args.profile is None:
+        for profile in PROFILES:
+            subprocess.run([sys.executable, "-m", "bench.sqlite_profiles", "--profile", profile,
+                            "--ops", str(args.ops), "--tasks", str(args.tasks)], check=True,
+                           env=dict(os.environ, SQLITE_PROFILE=profile))
+    else:
+        configure(f"profile_{args.profile}")
+        asyncio.run(run(args.profile, args.ops, args.tasks))
@@ -0,0 +1,43 @@
+"""
+Sequential write throughput of Users.update, Chats.update, Chats.chat_status_change and update_admin.
+
+    python -m bench.writes [--calls 2000]
+
+Runs with SQLite's default journal mode unless SQLITE_PROFILE is set, so the
+fsync of every commit dominates, as in the figures of the one-statement
+update change.
+"""
+import argparse
+import asyncio
+import time
+from bench.common import configure, seed
+
+configure("writes", SQLITE_PROFILE="default")
+
+from database.database import AdminsPermissions, Chats, Users  # noqa: E402
+
+
+async def run(name: str, calls: int, write) -> None:
+    Users._cache.clear()
+    Chats._cache.clear()
+    started = time.perf_counter()
+    for i in range(1, calls + 1):
+        await write(i)
+    elapsed = time.perf_counter() - started
+    print(f"{name:26s} {calls / elapsed:8.0f} writes/s")
+
+
+async def main(calls: int) -> None:
+    await seed()
+    await run("Users.update", calls, lambda i: Users.update(i, language="en"))
+    await run("Chats.update", calls, lambda i: Chats.update(-i, chat_title="t"))
+    await run("Chats.chat_status_change", calls,
+              lambda i: Chats.chat_status_change(-i, "group", "x", True, bool(i % 2)))
+    await run("update_admin", calls,
+              lambda i: AdminsPermissions.update_admin(-(i % 500 + 1), i, {"can_restrict_members": True}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="Calls per operation")
+    asyncio.run(main(parser.parse_args().calls))
@@ -1,9 +1,15 @@
 from .settings import BotSettings, bot_settings_buttons, settings_handlers
 from .callbacks import settings_callback_handlers
+from .broadcast import broadcaster, broadcast_handlers
+from .stats import runtime_stats, stats_handlers
 
 __all__ = [
     'BotSettings',
+    'broadcaster',
+    'broadcast_handlers',
     'bot_settings_buttons',
     'settings_callback_handlers',
-    'settings_handlers'
+    'settings_handlers',
+    'runtime_stats',
+    'stats_handlers'
 ]
@@ -0,0 +1,304 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+from pyrogram import Client, filters
+from pyrogram.errors import (ChannelInvalid, ChannelPrivate, ChatAdminRequired, ChatIdInvalid, ChatRestricted,
+                             ChatWriteForbidden, FloodWait, InputUserDeactivated, MessageIdInvalid,
+                             MessageNotModified, PeerIdInvalid, RPCError, UserDeactivated, UserDeactivatedBan,
+                             UserIsBlocked, UserIsBot)
+from pyrogram.handlers import MessageHandler
+from pyrogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from database import Broadcasts, Chats, Users
+from database.database import keyset_page
+from bot.settings import bot_settings
+from tools.conversation import conversations
+from tools.enums import Messages
+from tools.logger import logger
+from tools.outbound import awaiting_sends, raising_flood_wait, set_handler_path
+from tools.rate_limit import TokenBucket
+from tools.tools import owner_only, with_language, wait_input_filter
+
+
+# Messages per second across all broadcasts; Telegram allows bots about 30
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 25))
+# Sends in flight at once per broadcast
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", 8))
+# Recipients read per page; progress is saved after every page
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", 500))
+# Seconds between edits of the live status message
+BROADCAST_STATUS_INTERVAL = float(os.getenv("BROADCAST_STATUS_INTERVAL", 5))
+
+BROADCAST_TARGETS = {"users": (Users, Users.user_id), "chats": (Chats, Chats.chat_id)}
+
+# Errors meaning the recipient can no longer be messaged; it is marked inactive
+RECIPIENT_GONE_ERRORS = (UserIsBlocked, UserIsBot, InputUserDeactivated, UserDeactivated, UserDeactivatedBan,
+                         PeerIdInvalid, ChatWriteForbidden, ChatRestricted, ChatAdminRequired, ChannelPrivate,
+                         ChannelInvalid, ChatIdInvalid)
+
+
+class BroadcastJob:
+    """In-memory state of one running broadcast, loaded from and saved to its Broadcasts row."""
+
+    def __init__(self, row: Dict[str, Any]):
+        self.id = row["id"]
+        self.target = row["target"]
+        self.from_chat_id = row["from_chat_id"]
+        self.message_id = row["message_id"]
+        self.status = row["status"]
+        self.cursor = row["cursor"]
+        self.total = row["total"]
+        self.sent = row["sent"]
+        self.blocked = row["blocked"]
+        self.failed = row["failed"]
+        self.language = row["language"]
+        self.status_chat_id = row["status_chat_id"]
+        self.status_message_id = row["status_message_id"]
+        self.stopping = False
+        self.task: Optional[asyncio.Task] = None
+        self._started = time.monotonic()
+        self._processed_at_start = self.processed
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+    @property
+    def rate(self) -> float:
+        """Recipients processed per second since this process started the job."""
+        elapsed = time.monotonic() - self._started
+        return (self.processed - self._processed_at_start) / elapsed if elapsed > 0 else 0.0
+
+    def progress(self) -> Dict[str, Any]:
+        return {"cursor": self.cursor, "sent": self.sent, "blocked": self.blocked, "failed": self.failed}
+
+
+class Broadcaster:
+    """
+    Send a message to every active, non-banned user or chat.
+
+    Recipients are read page by page in key order and sent by a pool of
+    workers that all draw from one token bucket, so the bot stays under
+    Telegram's global rate limit; a FloodWait pauses the bucket for every
+    worker. Recipients that blocked the bot or no longer exist are marked
+    inactive once per page. Progress is saved after each page, and running
+    broadcasts are resumed on startup; a restart re-sends at most the page
+    that was in flight.
+    """
+
+    def __init__(self, rate: float, workers: int, page_size: int, status_interval: float):
+        self.bucket = TokenBucket(rate)
+        self.workers = workers
+        self.page_size = page_size
+        self.status_interval = status_interval
+        self.jobs: Dict[int, BroadcastJob] = {}
+
+    async def start(self, client: Client, target: str, source: Message, status: Message,
+                    language: str) -> BroadcastJob:
+        """Start broadcasting a copy of ``source`` and report progress by editing ``status``."""
+        model, _ = BROADCAST_TARGETS[target]
+        row = await Broadcasts.create(target=target, from_chat_id=source.chat.id, message_id=source.id,
+                                      total=await model.count_by(is_active=True, is_banned=False),
+                                      language=language, status_chat_id=status.chat.id,
+                                      status_message_id=status.id)
+        return self._spawn(client, row)
+
+    async def resume(self, client: Client) -> int:
+        """Restart the broadcasts that were running when the bot stopped and return how many."""
+        rows = await Broadcasts.running()
+        for row in rows:
+            if row["id"] not in self.jobs:
+                self._spawn(client, row)
+        return len(rows)
+
+    def _spawn(self, client: Client, row: Dict[str, Any]) -> BroadcastJob:
+        job = BroadcastJob(row)
+        self.jobs[job.id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(client, job))
+        return job
+
+    def stop(self, broadcast_id: int) -> bool:
+        """Ask a running broadcast to stop after the sends in flight; False if it is not running."""
+        job = self.jobs.get(broadcast_id)
+        if job is None:
+            return False
+        job.stopping = True
+        return True
+
+    async def close(self) -> None:
+        """Cancel the running broadcasts on shutdown; their rows stay "running" and resume on startup."""
+        tasks = [job.task for job in self.jobs.values() if job.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, client: Client, job: BroadcastJob) -> None:
+        # Started from a handler, but the broadcast waits for every send
+        set_handler_path(False)
+        model, key = BROADCAST_TARGETS[job.target]
+        reporter = asyncio.get_running_loop().create_task(self._report_periodically(client, job))
+        try:
+            while not job.stopping:
+                rows, more = await keyset_page(model, key, (key,), self.page_size, after=job.cursor,
+                                               is_active=True, is_banned=False)
+                if not rows:
+                    break
+                gone = await self._send_page(client, job, [row[key.name] for row in rows])
+                if gone:
+                    await model.set_inactive(gone)
+                if not job.stopping:
+                    job.cursor = rows[-1][key.name]
+                await Broadcasts.save(job.id, **job.progress())
+                if not more:
+                    break
+            if job.status == "running":
+                job.status = "cancelled" if job.stopping else "done"
+        except asyncio.CancelledError:
+            reporter.cancel()
+            self.jobs.pop(job.id, None)
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job.id} failed: {e}", exc_info=True)
+            job.status = "failed"
+        reporter.cancel()
+        self.jobs.pop(job.id, None)
+        try:
+            await Broadcasts.save(job.id, status=job.status, **job.progress())
+        except Exception as e:
+            logger.error(f"Error saving broadcast {job.id}: {e}")
+        await self._report(client, job)
+        logger.info(f"Broadcast {job.id} {job.status}: sent {job.sent}, blocked {job.blocked}, failed {job.failed}")
+
+    async def _send_page(self, client: Client, job: BroadcastJob, recipients: List[int]) -> List[int]:
+        """Send to one page of recipients with the worker pool and return those that are gone."""
+        pending = iter(recipients)
+        gone = []
+
+        async def worker():
+            # Workers share one iterator; next() never yields to the loop, so each ID is taken once
+            for chat_id in pending:
+                if job.stopping:
+                    return
+                if not await self._send(client, job, chat_id):
+                    gone.append(chat_id)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(recipients)))))
+        return gone
+
+    async def _send(self, client: Client, job: BroadcastJob, chat_id: int) -> bool:
+        """Copy the broadcast message to one recipient; False if the recipient is gone."""
+        while True:
+            await self.bucket.acquire()
+            try:
+                # FloodWait must reach this worker so it can pause all of them
+                with raising_flood_wait():
+                    await client.copy_message(chat_id, job.from_chat_id, job.message_id)
+            except FloodWait as e:
+                logger.warning(f"Broadcast {job.id}: FloodWait of {e.value}s, pausing all sends")
+                self.bucket.pause(e.value)
+                continue
+            except RECIPIENT_GONE_ERRORS:
+                job.blocked += 1
+                return False
+            except MessageIdInvalid:
+                # The source message was deleted, so every other send would fail too
+                job.failed += 1
+                job.stopping = True
+                job.status = "failed"
+                return True
+            except RPCError as e:
+                logger.debug(f"Broadcast {job.id}: sending to {chat_id} failed: {e}")
+                job.failed += 1
+                return True
+            job.sent += 1
+            return True
+
+    def status_text(self, job: BroadcastJob) -> str:
+        messages = Messages(language=job.language or "en")
+        state = {"running": messages.broadcast_state_running, "done": messages.broadcast_state_done,
+                 "cancelled": messages.broadcast_state_cancelled,
+                 "failed": messages.broadcast_state_failed}.get(job.status, job.status)
+        if job.status == "running" and job.stopping:
+            state = messages.broadcast_state_stopping
+        remaining = max(0, job.total - job.processed)
+        eta = f"{remaining / job.rate / 60:.0f}" if job.rate > 0 and job.status == "running" else "-"
+        target = getattr(messages, f"broadcast_target_{job.target}")
+        return messages.broadcast_status.format(job.id, target, state, job.processed, job.total, job.sent,
+                                                job.blocked, job.failed, f"{job.rate:.1f}", eta)
+
+    async def _report(self, client: Client, job: BroadcastJob) -> None:
+        if not job.status_chat_id:
+            return
+        markup = None
+        if job.status == "running" and not job.stopping:
+            messages = Messages(language=job.language or "en")
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton(messages.broadcast_stop_button,
+                                                                 callback_data=f"bot:bc:stop:{job.id}")]])
+        try:
+            await client.edit_message_text(job.status_chat_id, job.status_message_id, self.status_text(job),
+                                           reply_markup=markup)
+        except MessageNotModified:
+            pass
+        except FloodWait:
+            # Status edits are best effort; the next one will catch up
+            pass
+        except RPCError as e:
+            logger.warning(f"Error updating broadcast {job.id} status: {e}")
+
+    async def _report_periodically(self, client: Client, job: BroadcastJob) -> None:
+        while True:
+            await self._report(client, job)
+            await asyncio.sleep(self.status_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self.jobs),
+            "rate": round(sum(job.rate for job in self.jobs.values()), 1),
+            "bucket": self.bucket.stats(),
+        }
+
+
+broadcaster = Broadcaster(
+    rate=BROADCAST_RATE,
+    workers=BROADCAST_WORKERS,
+    page_size=BROADCAST_PAGE_SIZE,
+    status_interval=BROADCAST_STATUS_INTERVAL
+)
+
+
+async def on_broadcast_callback(query: CallbackQuery, messages: Messages, args: List[str]) -> None:
+    """Handle ``bot:bc:<users|chats>`` (ask for the message) and ``bot:bc:stop:<id>``."""
+    if args[0] in BROADCAST_TARGETS:
+        conversations.set(query.from_user.id, f"broadcast_{args[0]}")
+        await query.edit_message_text(messages.send_broadcast.format(getattr(messages, f"broadcast_target_{args[0]}")))
+    elif args[0] == "stop" and len(args) == 2 and args[1].isdigit():
+        stopped = broadcaster.stop(int(args[1]))
+        await query.answer(messages.broadcast_stopping if stopped else messages.broadcast_not_running)
+    else:
+        await query.answer()
+
+
+@owner_only
+@with_language
+async def broadcast_message(client: Client, message: Message, language: str):
+    messages = Messages(language=language)
+    state = conversations.get(message.from_user.id)
+    conversations.clear(message.from_user.id)
+    if message.text == "/cancel":
+        await message.delete()
+        await bot_settings(client, message)
+        return
+    target = state.partition("_")[2] if state else None
+    if target not in BROADCAST_TARGETS:
+        # The prompt expired or was answered since the filter matched
+        await bot_settings(client, message)
+        return
+    with awaiting_sends():
+        status = await message.reply(messages.broadcast_starting)
+    await broadcaster.start(client, target, message, status, language)
+
+
+broadcast_handlers = [
+    MessageHandler(broadcast_message, filters.private & ~filters.service &
+                   (wait_input_filter("broadcast_users") | wait_input_filter("broadcast_chats")))
+]
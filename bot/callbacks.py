@@ -1,26 +1,24 @@
-import json
+import asyncio
+import html
+import os
 import tempfile
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 from pyrogram import filters
+from pyrogram.errors import MessageNotModified
 from pyrogram.handlers import CallbackQueryHandler
 from pyrogram.types import CallbackQuery
-from database import Users, Chats, BotSettings
+from database import Users, Chats, BotSettings, Counters
 from tools.tools import with_language, owner_only
-from tools.inline_keyboards import bot_settings_buttons, buttons_builder
+from tools.inline_keyboards import bot_settings_buttons, buttons_builder, list_buttons, LIST_CHAT_TYPES
 from tools.enums import Messages
+from tools.conversation import conversations
+from tools.export import StreamingExporter, EXPORT_BATCH_SIZE
+from bot.broadcast import on_broadcast_callback
 
 
-def _serialize_value(value):
-    """Recursively serialize values to be JSON-compatible."""
-    from datetime import datetime
-    
-    if isinstance(value, datetime):
-        return value.isoformat()
-    elif isinstance(value, dict):
-        return {k: _serialize_value(v) for k, v in value.items()}
-    elif isinstance(value, (list, tuple)):
-        return [_serialize_value(item) for item in value]
-    return value
+# Rows per page of the users/chats lists
+ADMIN_LIST_PAGE_SIZE = int(os.getenv("ADMIN_LIST_PAGE_SIZE", 10))
 
 
 @owner_only
@@ -35,7 +33,13 @@ async def on_callback_settings(_, query: CallbackQuery, language: str):
     """
     messages = Messages(language=language)
     data = query.data.split(":")
-    
+
+    if len(data) > 2 and data[1] == "list":
+        await _show_list(query, messages, language, data[2:])
+        return
+    if len(data) > 2 and data[1] == "bc":
+        await on_broadcast_callback(query, messages, data[2:])
+        return
     if len(data) != 2:
         return
     
@@ -43,14 +47,11 @@ async def on_callback_settings(_, query: CallbackQuery, language: str):
     
     # Handle statistics
     if action == "statistics":
-        users = await Users.count()
-        active_users = await Users.count_by(is_active=True)
-        chats = await Chats.count()
-        active_chats = await Chats.count_by(is_active=True)
-        
+        counters = await Counters.get_all()
         back_button = buttons_builder(messages.back_button, "bot:back")
         
-        text = messages.statistics.format(users, active_users, chats, active_chats)
+        text = messages.statistics.format(counters["users_total"], counters["users_active"],
+                                          counters["chats_total"], counters["chats_active"])
         await query.edit_message_text(
             text,
             reply_markup=back_button
@@ -67,40 +68,120 @@ async def on_callback_settings(_, query: CallbackQuery, language: str):
             reply_markup=bot_settings_buttons(await BotSettings.get_settings(), language)
         )
     elif action == "banid":
-        await Users.update(user_id=query.from_user.id, wait_input="banid")
+        conversations.set(query.from_user.id, "banid")
         await query.edit_message_text(messages.send_banid)
     elif action == "unbanid":
-        await Users.update(user_id=query.from_user.id, wait_input="unbanid")
+        conversations.set(query.from_user.id, "unbanid")
         await query.edit_message_text(messages.send_unbanid)
         
 
 
+def _list_filters(table: str, token: str, messages: Messages) -> Optional[Dict[str, Any]]:
+    """Translate a list filter token into column filters, or None if it is not valid for the table."""
+    if token == "all":
+        return {}
+    if token == "act":
+        return {"is_active": True}
+    if token == "ban":
+        return {"is_banned": True}
+    kind, _, value = token.partition(".")
+    if kind == "l" and value in messages.languages():
+        return {"language": value}
+    if kind == "t" and table == "c" and value in LIST_CHAT_TYPES:
+        return {"chat_type": value}
+    return None
+
+
+def _format_row(table: str, row: Dict[str, Any]) -> str:
+    flags = ("🚫" if row["is_banned"] else "") + ("" if row["is_active"] else "💤")
+    if table == "u":
+        name = html.escape(row["full_name"] or "")
+        username = f" @{row['username']}" if row["username"] else ""
+        return f"<code>{row['user_id']}</code>{username} {name} [{row['language'] or '-'}] {flags}".rstrip()
+    title = html.escape(row["chat_title"] or "")
+    chat_type = row["chat_type"] or "-"
+    return f"<code>{row['chat_id']}</code> {title} ({chat_type}) [{row['language'] or '-'}] {flags}".rstrip()
+
+
+async def _show_list(query: CallbackQuery, messages: Messages, language: str, args: List[str]) -> None:
+    """Show one keyset page of users or chats, args being [table, filter, (n|p, key)]."""
+    table = args[0]
+    token = args[1] if len(args) > 1 else "all"
+    column_filters = _list_filters(table, token, messages)
+    if table not in ("u", "c") or column_filters is None:
+        await query.answer()
+        return
+    after = before = None
+    if len(args) == 4 and args[2] in ("n", "p"):
+        try:
+            cursor = int(args[3])
+        except ValueError:
+            await query.answer()
+            return
+        if args[2] == "n":
+            after = cursor
+        else:
+            before = cursor
+
+    model = Users if table == "u" else Chats
+    rows, more = await model.page(ADMIN_LIST_PAGE_SIZE, after=after, before=before, **column_filters)
+    key = "user_id" if table == "u" else "chat_id"
+    # A page reached through a cursor always has a neighbour on the side it came from
+    if before is not None:
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = after is not None, more
+    prev_cursor = rows[0][key] if rows and has_prev else None
+    next_cursor = rows[-1][key] if rows and has_next else None
+
+    title = messages.list_users_title if table == "u" else messages.list_chats_title
+    label = {"all": messages.list_filter_all, "act": messages.list_filter_active,
+             "ban": messages.list_filter_banned}.get(token) or token.partition(".")[2]
+    lines = [_format_row(table, row) for row in rows] or [messages.list_empty]
+    try:
+        await query.edit_message_text(
+            title.format(label) + "\n\n" + "\n".join(lines),
+            reply_markup=list_buttons(table, token, language, prev_cursor, next_cursor)
+        )
+    except MessageNotModified:
+        await query.answer()
+
+
 async def _export_data(query: CallbackQuery, messages: Messages, data_type: str) -> None:
-    """Export all users or chats as JSON and send as a document."""
-    model = Users() if data_type == "users" else Chats()
-    items = await model.get_all()
-    if not items:
+    """Stream all users or chats into NDJSON/CSV part files and send each as a document."""
+    model = Users if data_type == "users" else Chats
+    pages = model.iter_all(batch_size=EXPORT_BATCH_SIZE)
+    first_page = await anext(pages, None)
+    if not first_page:
         await query.answer(messages.no_data_to_export, show_alert=True)
         return
 
     await query.answer(messages.exporting_data)
-    data = _serialize_value(items)
-    filename = f"{data_type}_export_{datetime.now():%Y%m%d_%H%M%S}.json"
+    base_name = f"{data_type}_export_{datetime.now():%Y%m%d_%H%M%S}"
 
-    with tempfile.NamedTemporaryFile("w+", encoding="utf-8", suffix=".json", delete=True) as tmp:
-        json.dump(data, tmp, ensure_ascii=False, indent=2)
-        tmp.seek(0)
+    async def send_part(path: str) -> None:
         await query.message.reply_document(
-            document=tmp.name,
-            file_name=filename,
+            document=path,
+            file_name=os.path.basename(path),
             caption=messages.export_success.format(data_type),
         )
+        os.remove(path)
 
+    with tempfile.TemporaryDirectory() as directory:
+        exporter = StreamingExporter(directory, base_name)
+        for path in await asyncio.to_thread(exporter.write_rows, first_page):
+            await send_part(path)
+        async for page in pages:
+            for path in await asyncio.to_thread(exporter.write_rows, page):
+                await send_part(path)
+        path = await asyncio.to_thread(exporter.close)
+        if path:
+            await send_part(path)
 
 
 settings_callback_handlers = [
     CallbackQueryHandler(
         on_callback_settings,
-        filters.regex(r"^bot:(\w+)$")
+        filters.regex(r"^bot:(\w+)(:[\w.-]+)*$")
     )
 ]
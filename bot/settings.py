@@ -1,17 +1,32 @@
+import html
+import os
+import re
+import tempfile
+import time
 from pyrogram import filters
 from pyrogram.types import Message
 from database.database import Chats
 from tools.inline_keyboards import bot_settings_buttons
-from tools.enums import Messages
+from tools.enums import Messages, locale_watcher
 from pyrogram.handlers import MessageHandler
-from database import BotSettings, Users
+from database import BotSettings, SearchIndex, Users
+from tools.conversation import conversations
+from tools.importer import IMPORT_MODELS, import_file
+from tools.outbound import awaiting_sends
 from tools.tools import (is_valid_chat_id, 
                          is_valid_user_id,
+                         parse_id_list,
                          with_language,
                          owner_only,
                          wait_input_filter)
 
 
+# Largest ID list file accepted by the bulk ban/unban flow
+BULK_BAN_MAX_FILE_MB = int(os.getenv("BULK_BAN_MAX_FILE_MB", 10))
+# Results per table returned by /search
+SEARCH_RESULTS_LIMIT = int(os.getenv("SEARCH_RESULTS_LIMIT", 10))
+
+
 @owner_only
 @with_language
 async def bot_settings(_, message: Message, language: str):
@@ -21,36 +36,73 @@ async def bot_settings(_, message: Message, language: str):
     await message.reply(messages.bot_settings, reply_markup=buttons)
 
 
+def _is_bulk_input(message: Message) -> bool:
+    """True for an uploaded file or a text holding more than one ID."""
+    if message.document:
+        return True
+    return bool(message.text) and len(re.findall(r"[^\s,;]+", message.text)) > 1
+
+
+async def _bulk_set_banned(_, message: Message, messages: Messages, is_banned: bool) -> None:
+    """Ban or unban every ID of a pasted list or uploaded file and reply with one summary."""
+    if message.document:
+        if (message.document.file_size or 0) > BULK_BAN_MAX_FILE_MB * 1024 * 1024:
+            await message.reply(messages.bulk_file_too_large.format(BULK_BAN_MAX_FILE_MB))
+            return
+        data = await message.download(in_memory=True)
+        text = bytes(data.getbuffer()).decode("utf-8-sig", errors="replace")
+        csv_format = (message.document.file_name or "").lower().endswith(".csv")
+    else:
+        text, csv_format = message.text, False
+
+    user_ids, chat_ids, invalid = parse_id_list(text, csv_format)
+    if not user_ids and not chat_ids:
+        await message.reply(messages.bulk_no_ids)
+        return
+
+    users = await Users.set_banned(user_ids, is_banned)
+    chats = await Chats.set_banned(chat_ids, is_banned)
+    summary = messages.bulk_ban_summary if is_banned else messages.bulk_unban_summary
+    await message.reply(summary.format(users["changed"] + chats["changed"],
+                                       users["unchanged"] + chats["unchanged"],
+                                       users["not_found"] + chats["not_found"],
+                                       invalid))
+    conversations.clear(message.from_user.id)
+    await bot_settings(_, message)
+
+
 @owner_only
 @with_language
 async def ban_user_or_chat(_, message: Message, language: str):
     messages = Messages(language=language)
-    if is_valid_chat_id(message.text):
-        chat = await Chats.get(chat_id=int(message.text))
-        if chat and not chat.get("is_banned"):
+    if _is_bulk_input(message):
+        await _bulk_set_banned(_, message, messages, is_banned=True)
+    elif is_valid_chat_id(message.text):
+        chat = await Chats.get_record(int(message.text))
+        if chat and not chat.is_banned:
             await Chats.update(chat_id=int(message.text), is_banned=True)
             await message.reply(messages.banid_success)
-            await Users.update(user_id=message.from_user.id, wait_input=None)
+            conversations.clear(message.from_user.id)
             await message.delete()
             await bot_settings(_, message)
-        elif chat and chat.get("is_banned"):
+        elif chat and chat.is_banned:
             await message.reply(messages.banid_chat_already_banned)
         else:
             await message.reply(messages.banid_chat_not_found)
     elif is_valid_user_id(message.text):
-        user = await Users.get(user_id=int(message.text))
-        if user and not user.get("is_banned"):
+        user = await Users.get_record(int(message.text))
+        if user and not user.is_banned:
             await Users.update(user_id=int(message.text), is_banned=True)
             await message.reply(messages.banid_success)
-            await Users.update(user_id=message.from_user.id, wait_input=None)
+            conversations.clear(message.from_user.id)
             await message.delete()
             await bot_settings(_, message)
-        elif user and user.get("is_banned"):
+        elif user and user.is_banned:
             await message.reply(messages.banid_user_already_banned)
         else:
             await message.reply(messages.banid_user_not_found)
     elif message.text == "/cancel":
-        await Users.update(user_id=message.from_user.id, wait_input=None)
+        conversations.clear(message.from_user.id)
         await message.delete()
         await bot_settings(_, message)
     else:
@@ -61,38 +113,123 @@ async def ban_user_or_chat(_, message: Message, language: str):
 @with_language
 async def unban_user_or_chat(_, message: Message, language: str):
     messages = Messages(language=language)
-    if is_valid_chat_id(message.text):
-        chat = await Chats.get(chat_id=int(message.text))
-        if chat and chat.get("is_banned"):
+    if _is_bulk_input(message):
+        await _bulk_set_banned(_, message, messages, is_banned=False)
+    elif is_valid_chat_id(message.text):
+        chat = await Chats.get_record(int(message.text))
+        if chat and chat.is_banned:
             await Chats.update(chat_id=int(message.text), is_banned=False)
             await message.reply(messages.banid_success)
-            await Users.update(user_id=message.from_user.id, wait_input=None)
+            conversations.clear(message.from_user.id)
             await message.delete()
             await bot_settings(_, message)
-        elif chat and not chat.get("is_banned"):
+        elif chat and not chat.is_banned:
             await message.reply(messages.unbanid_chat_not_banned)
         else:
             await message.reply(messages.unbanid_chat_not_found)
     elif is_valid_user_id(message.text):
-        user = await Users.get(user_id=int(message.text))
-        if user and user.get("is_banned"):
+        user = await Users.get_record(int(message.text))
+        if user and user.is_banned:
             await Users.update(user_id=int(message.text), is_banned=False)
             await message.reply(messages.unbanid_success)
-            await Users.update(user_id=message.from_user.id, wait_input=None)
+            conversations.clear(message.from_user.id)
             await message.delete()
             await bot_settings(_, message)
-        elif user and not user.get("is_banned"):
+        elif user and not user.is_banned:
             await message.reply(messages.unbanid_user_not_banned)
         else:
             await message.reply(messages.unbanid_user_not_found)
     elif message.text == "/cancel":
-        await Users.update(user_id=message.from_user.id, wait_input=None)
+        conversations.clear(message.from_user.id)
         await message.delete()
         await bot_settings(_, message)
     else:
         await message.reply(messages.unbanid_invalid)
 
 
+@owner_only
+@with_language
+async def reload_locales(_, message: Message, language: str):
+    try:
+        elapsed = await locale_watcher.reload()
+    except Exception as e:
+        await message.reply(Messages(language=language).locales_reload_failed.format(e))
+        return
+    await message.reply(Messages(language=language).locales_reloaded.format(f"{elapsed * 1000:.1f}"))
+
+
+def _search_line(row: dict, key: str, columns: tuple) -> str:
+    names = " · ".join(html.escape(str(row[column])) for column in columns if row[column])
+    flags = ("🚫" if row["is_banned"] else "") + ("" if row["is_active"] else "💤")
+    return f"<code>{row[key]}</code> {names} {flags}".rstrip()
+
+
+@owner_only
+@with_language
+async def search(_, message: Message, language: str):
+    messages = Messages(language=language)
+    query = " ".join(message.command[1:])
+    if not query:
+        await message.reply(messages.search_usage)
+        return
+    started = time.perf_counter()
+    users = await SearchIndex.search("users", query, SEARCH_RESULTS_LIMIT)
+    chats = await SearchIndex.search("chats", query, SEARCH_RESULTS_LIMIT)
+    elapsed = (time.perf_counter() - started) * 1000
+    if not users and not chats:
+        await message.reply(messages.search_no_results.format(html.escape(query)))
+        return
+    sections = []
+    if users:
+        sections.append("\n".join([messages.search_users_header] +
+                                   [_search_line(row, "user_id", ("username", "full_name")) for row in users]))
+    if chats:
+        sections.append("\n".join([messages.search_chats_header] +
+                                   [_search_line(row, "chat_id", ("chat_title",)) for row in chats]))
+    sections.append(messages.search_took.format(f"{elapsed:.1f}"))
+    await message.reply("\n\n".join(sections))
+
+
+@owner_only
+@with_language
+async def rebuild_search(_, message: Message, language: str):
+    messages = Messages(language=language)
+    if not SearchIndex.supported():
+        await message.reply(messages.search_not_supported)
+        return
+    elapsed = await SearchIndex.rebuild()
+    await message.reply(messages.search_rebuilt.format(f"{elapsed * 1000:.1f}"))
+
+
+@owner_only
+@with_language
+async def import_data(_, message: Message, language: str):
+    messages = Messages(language=language)
+    table = message.command[1].lower() if len(message.command) > 1 else None
+    if not message.document or (table and table not in IMPORT_MODELS):
+        await message.reply(messages.import_usage)
+        return
+    with awaiting_sends():
+        status = await message.reply(messages.import_started)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, os.path.basename(message.document.file_name or "import.ndjson"))
+        await message.download(file_name=path)
+        try:
+            report = await import_file(path, table)
+        except Exception as e:
+            await status.edit_text(messages.import_failed.format(html.escape(str(e))))
+            return
+    await status.edit_text(messages.import_done.format(report.table, report.inserted, report.duplicates,
+                                                       report.invalid, f"{report.seconds:.1f}",
+                                                       f"{report.rows_per_second:.0f}"))
+
+
 settings_handlers = [MessageHandler(bot_settings, filters.command("admin")),
-                     MessageHandler(ban_user_or_chat, filters.private & (filters.text | filters.command("cancel")) & wait_input_filter("banid")),
-                     MessageHandler(unban_user_or_chat, filters.private & (filters.text | filters.command("cancel")) & wait_input_filter("unbanid"))]
+                     MessageHandler(reload_locales, filters.command("reload_locales") & filters.private),
+                     MessageHandler(search, filters.command("search") & filters.private),
+                     MessageHandler(rebuild_search, filters.command("rebuild_search") & filters.private),
+                     MessageHandler(import_data, filters.command("import") & filters.private),
+                     MessageHandler(ban_user_or_chat, filters.private & wait_input_filter("banid") &
+                                    (filters.text | filters.document | filters.command("cancel"))),
+                     MessageHandler(unban_user_or_chat, filters.private & wait_input_filter("unbanid") &
+                                    (filters.text | filters.document | filters.command("cancel")))]
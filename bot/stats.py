@@ -0,0 +1,42 @@
+import html
+from typing import Any, Dict, List
+from pyrogram import filters
+from pyrogram.handlers import MessageHandler
+from pyrogram.types import Message
+from database import admins_refresher, cache_stats
+from bot.broadcast import broadcaster
+from tools.dispatcher import sharded_dispatcher
+from tools.enums import Messages
+from tools.outbound import outbound
+from tools.tools import owner_only, with_language
+
+
+def runtime_stats() -> Dict[str, Dict[str, Any]]:
+    """Return the counters of the caches, writers, dispatcher, outbound scheduler, admin refresher and broadcasts."""
+    return {
+        **cache_stats(),
+        "dispatcher": sharded_dispatcher.stats(),
+        "outbound": outbound.stats(),
+        "admins_refresher": admins_refresher.stats(),
+        "broadcasts": broadcaster.stats(),
+    }
+
+
+def _flatten(values: Dict[str, Any], prefix: str = "") -> List[str]:
+    items = []
+    for key, value in values.items():
+        if isinstance(value, dict):
+            items += _flatten(value, f"{prefix}{key}.")
+        else:
+            items.append(f"{prefix}{key}={value}")
+    return items
+
+
+@owner_only
+@with_language
+async def show_stats(_, message: Message, language: str):
+    lines = [f"<b>{name}</b>: {html.escape(', '.join(_flatten(values)))}" for name, values in runtime_stats().items()]
+    await message.reply("\n".join([Messages(language=language).stats_header] + lines))
+
+
+stats_handlers = [MessageHandler(show_stats, filters.command("stats") & filters.private)]
@@ -1,9 +1,20 @@
 from database.database import *
+from database.admins_refresher import admins_refresher
 
 __all__ = [
     'Chats',
     'AdminsPermissions',
     'Users',
     'BotSettings',
-    'create_tables'
+    'Counters',
+    'SearchIndex',
+    'Broadcasts',
+    'UserRecord',
+    'ChatRecord',
+    'create_tables',
+    'load_banned_ids',
+    'cache_stats',
+    'write_behind',
+    'db_writer',
+    'admins_refresher'
 ]
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pyrogram.client import Client
+from pyrogram.errors import ChannelPrivate, ChatAdminRequired, ChatInvalid, PeerIdInvalid
+from sqlalchemy import select, or_
+from database.database import AdminsPermissions, Chats, async_session
+from tools.logger import logger
+
+
+ADMINS_REFRESH_INTERVAL = int(os.getenv("ADMINS_REFRESH_INTERVAL", 60))
+ADMINS_REFRESH_AFTER_HOURS = float(os.getenv("ADMINS_REFRESH_AFTER_HOURS", 20))
+ADMINS_REFRESH_CONCURRENCY = int(os.getenv("ADMINS_REFRESH_CONCURRENCY", 4))
+ADMINS_REFRESH_RATE = float(os.getenv("ADMINS_REFRESH_RATE", 2))
+ADMINS_REFRESH_BATCH = int(os.getenv("ADMINS_REFRESH_BATCH", 100))
+
+
+class AdminsRefreshScheduler:
+    """
+    Background refresher of admin rosters, keeping the command path off the Telegram API.
+
+    Every ``interval`` seconds it picks active chats where the bot is admin and
+    whose roster is older than ``refresh_after``, plus chats that
+    ``AdminsPermissions.is_admin`` served stale, and refreshes them: chats seen
+    stale by a command first, then the most recently checked, then the oldest.
+    Up to ``batch_size`` due chats are picked per poll, recently checked ones
+    before the rest. At most ``concurrency`` refreshes run at once, started at
+    no more than ``rate`` per second.
+    """
+
+    def __init__(self, interval: float = ADMINS_REFRESH_INTERVAL,
+                 refresh_after: timedelta = timedelta(hours=ADMINS_REFRESH_AFTER_HOURS),
+                 concurrency: int = ADMINS_REFRESH_CONCURRENCY,
+                 rate: float = ADMINS_REFRESH_RATE,
+                 batch_size: int = ADMINS_REFRESH_BATCH):
+        self.interval = interval
+        self.refresh_after = refresh_after
+        self.concurrency = concurrency
+        self.rate = rate
+        self.batch_size = batch_size
+        self._client: Optional[Client] = None
+        self._task: Optional[asyncio.Task] = None
+        self.refreshed = 0
+        self.failed = 0
+
+    def start(self, client: Client) -> asyncio.Task:
+        """Start refreshing in the background; is_admin stops refreshing inline from now on."""
+        self._client = client
+        AdminsPermissions._background_refresh = True
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    async def stop(self) -> None:
+        AdminsPermissions._background_refresh = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error in admins refresh scheduler: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _due_chats(self) -> List[int]:
+        threshold = datetime.now() - self.refresh_after
+        # Most recently checked first
+        active = AdminsPermissions._activity.keys()[::-1][:self.batch_size]
+        query = (
+            select(Chats.chat_id, Chats.last_admins_update)
+            .where(Chats.is_active, Chats.is_admin,
+                   or_(Chats.last_admins_update.is_(None), Chats.last_admins_update < threshold))
+        )
+        async with async_session() as session:
+            due = {}
+            if active:
+                result = await session.execute(query.where(Chats.chat_id.in_(active)))
+                due.update(result.all())
+            if len(due) < self.batch_size:
+                result = await session.execute(
+                    query.where(Chats.chat_id.not_in(due))
+                    .order_by(Chats.last_admins_update.is_not(None), Chats.last_admins_update)
+                    .limit(self.batch_size - len(due))
+                )
+                due.update(result.all())
+
+        stale = AdminsPermissions._stale_chats
+        AdminsPermissions._stale_chats = set()
+        for chat_id in stale:
+            due.setdefault(chat_id, None)
+
+        recency = {chat_id: rank for rank, chat_id in enumerate(active)}
+        return sorted(due, key=lambda chat_id: (
+            chat_id not in stale,
+            recency.get(chat_id, len(recency)),
+            due[chat_id] or datetime.min,
+        ))
+
+    async def _refresh(self, chat_id: int, semaphore: asyncio.Semaphore) -> None:
+        try:
+            await AdminsPermissions.refresh_admins(self._client, chat_id)
+            self.refreshed += 1
+        except (ChatAdminRequired, ChannelPrivate, ChatInvalid, PeerIdInvalid) as e:
+            # The bot lost its admin rights or the chat; join handlers set it again on re-promotion
+            self.failed += 1
+            logger.warning(f"Admins refresh for chat {chat_id} failed, marking bot as not admin: {e}")
+            await Chats.update(chat_id=chat_id, is_admin=False)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error refreshing admins for chat {chat_id}: {e}")
+        finally:
+            semaphore.release()
+
+    async def run_once(self) -> int:
+        """Refresh one batch of due chats and return how many were attempted."""
+        chat_ids = await self._due_chats()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = []
+        next_start = time.monotonic()
+        for chat_id in chat_ids:
+            delay = next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_start = time.monotonic() + 1 / self.rate
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(self._refresh(chat_id, semaphore)))
+        if tasks:
+            await asyncio.gather(*tasks)
+        return len(tasks)
+
+    def stats(self) -> dict:
+        return {
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "stale_pending": len(AdminsPermissions._stale_chats),
+            "recently_checked": len(AdminsPermissions._activity),
+        }
+
+
+admins_refresher = AdminsRefreshScheduler()
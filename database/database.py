@@ -1,30 +1,138 @@
 import os
+import asyncio
 from datetime import datetime, timedelta
 from pyrogram.client import Client
 from pyrogram.enums import ChatMembersFilter
 from pyrogram.errors import ChannelPrivate, ChatAdminRequired, ChatInvalid, PeerIdInvalid, RPCError
 from pyrogram.types import ChatPrivileges
 from tools.logger import logger
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func, ForeignKey, select, update, delete, JSON
+from sqlalchemy import (Column, Integer, String, Boolean, DateTime, func, ForeignKey, Index, select, insert, update,
+                        delete, inspect, bindparam, event, text, or_, JSON)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
-from typing import Any, List, Dict, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, NamedTuple, Optional, Tuple
+import json
 import time
-from tools.enums import AccessPermission
+from tools.enums import AccessPermission, PRIVILEGE_BITS, privileges_to_mask
+from tools.cache import TTLCache
+from tools.singleflight import SingleFlight
+from tools.ban_gate import banned_ids
 
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///my_bot.sqlite")
 
+# Read-through cache for Users.get / Chats.get (entries per table, seconds)
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", 10000))
+ENTITY_CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", 300))
+
+# Cache of per-chat admin rosters used by AdminsPermissions.is_admin (chats, seconds)
+ADMINS_CACHE_SIZE = int(os.getenv("ADMINS_CACHE_SIZE", 5000))
+ADMINS_CACHE_TTL = int(os.getenv("ADMINS_CACHE_TTL", 600))
+# How long a permission check keeps a chat first in line for background roster refreshes (seconds)
+ADMINS_ACTIVITY_TTL = int(os.getenv("ADMINS_ACTIVITY_TTL", 3600))
+
+# Optional write-behind queue for deferred metadata writes
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_INTERVAL_MS", 200))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 500))
+WRITE_BEHIND_MAX_BACKLOG = int(os.getenv("WRITE_BEHIND_MAX_BACKLOG", 10000))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", 5))
+
+
+# SQLite connection pragmas by profile (SQLITE_PROFILE); "default" leaves SQLite's own settings
+SQLITE_PROFILES = {
+    "default": {},
+    # WAL lets readers run alongside the writer; NORMAL only fsyncs at checkpoints,
+    # so a power loss can drop the last commits but never corrupts the database
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+    # WAL concurrency, but fsync on every commit
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "performance").lower()
+# Per-pragma overrides on top of the profile
+SQLITE_PRAGMA_OVERRIDES = {
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE"),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE"),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT"),
+}
+
+# Connection pool (ignored for in-memory SQLite, which shares a single connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))
+
+# Full-text matches ranked per search; broader queries rank only the first ones found
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", 2000))
+
+# Serialize all writes through one writer task and connection ("auto": only on SQLite files)
+DB_SINGLE_WRITER = os.getenv("DB_SINGLE_WRITER", "auto").lower()
+DB_WRITER_BATCH_SIZE = int(os.getenv("DB_WRITER_BATCH_SIZE", 100))
+
+
+def sqlite_pragmas(profile: str = SQLITE_PROFILE) -> Dict[str, Any]:
+    """Return the pragmas applied to every new SQLite connection for a profile."""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{profile}', expected one of {list(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    pragmas.update({name: int(value) for name, value in SQLITE_PRAGMA_OVERRIDES.items() if value})
+    return pragmas
+
+
+def _is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and not url.rstrip("/").endswith(":")
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    if not url.startswith("sqlite"):
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW,
+                "pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": True}
+    options: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}
+    if _is_sqlite_file(url):
+        # Keep file connections open instead of reconnecting (and re-running the pragmas)
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    return options
+
 
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
     future=True,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith('sqlite') else {}
+    **_engine_options(DATABASE_URL)
 )
 
 
+def install_sqlite_pragmas(target_engine, pragmas: Dict[str, Any]) -> None:
+    """Run pragmas on every new DBAPI connection of a SQLite engine."""
+    if target_engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(target_engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+install_sqlite_pragmas(engine, sqlite_pragmas())
+
+
 async_session = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -32,9 +140,309 @@ async_session = async_sessionmaker(
 )
 
 
+class SingleWriter:
+    """
+    Run every database mutation through one writer task that owns one connection.
+
+    ``run(fn)`` queues ``fn(session)`` and returns its result once committed.
+    Mutations queued while a transaction is open are batched into the next one
+    (up to ``batch_size``); if a batch fails, its mutations are retried one per
+    transaction so only the failing one gets the exception. Mutations must only
+    touch the session: Telegram calls and cache updates belong to the caller.
+    Reads keep using ``async_session`` and, in WAL mode, never wait for the writer.
+
+    When disabled, ``run`` executes ``fn`` in its own session and commits it.
+    """
+
+    def __init__(self, enabled: bool, batch_size: int):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self._session = async_session
+        if enabled and _is_sqlite_file(DATABASE_URL):
+            write_engine = create_async_engine(
+                DATABASE_URL,
+                echo=False,
+                future=True,
+                connect_args={"check_same_thread": False},
+                pool_size=1,
+                max_overflow=0
+            )
+            install_sqlite_pragmas(write_engine, sqlite_pragmas())
+            self._session = async_sessionmaker(bind=write_engine, class_=AsyncSession, expire_on_commit=False)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.committed = 0
+        self.failed = 0
+        self.transactions = 0
+        self.max_depth = 0
+        self.commit_seconds = 0.0
+        self.max_commit_seconds = 0.0
+
+    async def run(self, fn: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+        """Execute fn(session) in a write transaction and return its result after the commit."""
+        if not self.enabled:
+            async with async_session() as session:
+                result = await fn(session)
+                await session.commit()
+                return result
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((fn, future))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            batch, stop = [item], False
+            while len(batch) < self.batch_size and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            # Callers that were cancelled while queued are skipped
+            batch = [(fn, future) for fn, future in batch if not future.done()]
+            if batch:
+                await self._execute(batch)
+            if stop:
+                return
+
+    async def _execute(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        try:
+            async with self._session() as session:
+                results = [await fn(session) for fn, _ in batch]
+                await session.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                for item in batch:
+                    await self._execute([item])
+                return
+            self.failed += 1
+            future = batch[0][1]
+            if not future.done():
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - started
+        self.transactions += 1
+        self.committed += len(batch)
+        self.commit_seconds += elapsed
+        self.max_commit_seconds = max(self.max_commit_seconds, elapsed)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Commit everything already queued, then stop the writer task."""
+        if self._task is not None and not self._task.done():
+            self._queue.put_nowait(None)
+            await self._task
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_depth,
+            "submitted": self.submitted,
+            "committed": self.committed,
+            "failed": self.failed,
+            "transactions": self.transactions,
+            "avg_commit_ms": round(self.commit_seconds / self.transactions * 1000, 2) if self.transactions else 0.0,
+            "max_commit_ms": round(self.max_commit_seconds * 1000, 2),
+        }
+
+
+db_writer = SingleWriter(
+    enabled=DB_SINGLE_WRITER in ("1", "true", "yes") or (DB_SINGLE_WRITER == "auto" and _is_sqlite_file(DATABASE_URL)),
+    batch_size=DB_WRITER_BATCH_SIZE
+)
+
+
 Base = declarative_base()
 
 
+async def iter_table(model, key_column, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield every row of model's table as pages of dicts using keyset pagination.
+
+    Each page is a short, separate query (WHERE key > last ORDER BY key LIMIT n),
+    so no read transaction stays open while the caller processes a page.
+    """
+    last_key = None
+    while True:
+        stmt = select(model.__table__).order_by(key_column).limit(batch_size)
+        if last_key is not None:
+            stmt = stmt.where(key_column > last_key)
+        async with async_session() as session:
+            result = await session.execute(stmt)
+            page = [dict(row) for row in result.mappings()]
+        if not page:
+            return
+        yield page
+        if len(page) < batch_size:
+            return
+        last_key = page[-1][key_column.name]
+
+
+async def keyset_page(model, key_column, columns, limit: int, after: Optional[int] = None,
+                      before: Optional[int] = None, **filters) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Return one page of rows after (or before) a key, plus whether more rows follow in that direction.
+
+    The page starts at the cursor through the primary key index, so any page
+    costs the same as the first one, unlike OFFSET.
+    """
+    stmt = select(*columns).filter_by(**filters).limit(limit + 1)
+    if before is not None:
+        stmt = stmt.where(key_column < before).order_by(key_column.desc())
+    else:
+        if after is not None:
+            stmt = stmt.where(key_column > after)
+        stmt = stmt.order_by(key_column)
+    async with engine.connect() as conn:
+        rows = [dict(row) for row in (await conn.execute(stmt)).mappings()]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before is not None:
+        rows.reverse()
+    return rows, more
+
+
+def upsert(model):
+    """Return an INSERT for model that supports ON CONFLICT on the configured dialect."""
+    if engine.dialect.name == "postgresql":
+        return postgresql_insert(model)
+    return sqlite_insert(model)
+
+
+class UserRecord(NamedTuple):
+    """Immutable snapshot of the user columns read while handling updates."""
+    user_id: int
+    language: Optional[str]
+    is_active: bool
+    is_banned: bool
+
+    @classmethod
+    def from_row(cls, row) -> "UserRecord":
+        return cls(*(row[name] for name in cls._fields))
+
+
+class ChatRecord(NamedTuple):
+    """Immutable snapshot of the chat columns read while handling updates."""
+    chat_id: int
+    chat_type: Optional[str]
+    language: Optional[str]
+    is_active: bool
+    is_banned: bool
+    is_admin: bool
+    last_admins_update: Optional[datetime]
+
+    @classmethod
+    def from_row(cls, row) -> "ChatRecord":
+        return cls(*(row[name] for name in cls._fields))
+
+
+class CachedEntity(NamedTuple):
+    """Entity cache entry: the record, plus the full row once Users.get or Chats.get has read it."""
+    record: Any
+    row: Optional[Dict[str, Any]] = None
+
+
+def _track_ban(entity_id: int, is_banned: bool) -> None:
+    """Mirror a committed is_banned change in the pre-dispatch ban gate."""
+    if is_banned:
+        banned_ids.add(entity_id)
+    else:
+        banned_ids.discard(entity_id)
+
+
+async def load_banned_ids() -> int:
+    """Load the IDs of all banned users and chats into the ban gate and return how many there are."""
+    async with engine.connect() as conn:
+        users = await conn.execute(select(Users.user_id).where(Users.is_banned))
+        chats = await conn.execute(select(Chats.chat_id).where(Chats.is_banned))
+        banned_ids.replace([*users.scalars(), *chats.scalars()])
+    return len(banned_ids)
+
+
+# IDs per UPDATE ... WHERE id IN (...) statement in bulk ban/unban and deactivation
+BAN_CHUNK_SIZE = 500
+
+
+async def set_banned(model, key_column, entity_ids: List[int], is_banned: bool) -> Dict[str, int]:
+    """
+    Ban or unban many rows of model with chunked UPDATE ... WHERE key IN (...) statements.
+
+    Each chunk is one writer transaction that updates only the rows whose flag
+    actually changes and counts which of the remaining IDs exist.
+
+    Returns:
+        Dict[str, int]: "changed", "unchanged" (already in that state) and "not_found" counts
+    """
+    counts = {"changed": 0, "unchanged": 0, "not_found": 0}
+    for start in range(0, len(entity_ids), BAN_CHUNK_SIZE):
+        chunk = entity_ids[start:start + BAN_CHUNK_SIZE]
+
+        async def write(session):
+            changed = await session.execute(
+                update(model.__table__)
+                .where(key_column.in_(chunk), model.is_banned.is_not(is_banned))
+                .values(is_banned=is_banned)
+                .returning(key_column)
+            )
+            changed = list(changed.scalars())
+            existing = await session.execute(select(func.count()).where(key_column.in_(chunk)))
+            return changed, existing.scalar_one()
+        changed, existing = await db_writer.run(write)
+
+        for entity_id in changed:
+            model._cache.pop(entity_id)
+            _track_ban(entity_id, is_banned)
+        counts["changed"] += len(changed)
+        counts["unchanged"] += existing - len(changed)
+        counts["not_found"] += len(chunk) - existing
+    return counts
+
+
+async def set_inactive(model, key_column, entity_ids: List[int]) -> List[int]:
+    """
+    Mark many rows of model inactive (e.g. users who blocked the bot) with chunked UPDATE statements.
+
+    Returns:
+        List[int]: The IDs that were active before the call
+    """
+    changed = []
+    for start in range(0, len(entity_ids), BAN_CHUNK_SIZE):
+        chunk = entity_ids[start:start + BAN_CHUNK_SIZE]
+
+        async def write(session):
+            result = await session.execute(
+                update(model.__table__)
+                .where(key_column.in_(chunk), model.is_active.is_not(False))
+                .values(is_active=False)
+                .returning(key_column)
+            )
+            return list(result.scalars())
+        changed += await db_writer.run(write)
+    for entity_id in changed:
+        model._cache.pop(entity_id)
+    return changed
+
+
+def record_query(model, record_cls, key_column):
+    """Build the Core SELECT of record_cls's columns for one row, keyed by the "key" parameter."""
+    return select(*(model.__table__.c[name] for name in record_cls._fields)).where(key_column == bindparam("key"))
+
+
 class Chats(Base):
     __tablename__ = 'chats'
     chat_id = Column(Integer, primary_key=True, index=True, unique=True)
@@ -53,80 +461,143 @@ class Chats(Base):
     # Relationship with AdminsPermissions
     admins_permissions = relationship("AdminsPermissions", back_populates="chat", cascade="all, delete-orphan")
 
+    # Read-through cache of CachedEntity(ChatRecord, full row) keyed by chat_id
+    _cache = TTLCache(maxsize=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
+
     @classmethod
     async def create(cls, chat_id: int, chat_type: str, chat_title: str, is_active: bool = True) -> Dict[str, Any]:
-        async with async_session() as session:
+        async def write(session):
             result = await session.execute(select(cls).filter_by(chat_id=chat_id))
             chat = result.scalars().first()
             if chat is None:
                 chat = cls(chat_id=chat_id, chat_type=chat_type, chat_title=chat_title, is_active=is_active)
                 session.add(chat)
-                await session.commit()
+                await session.flush()
                 await session.refresh(chat)
-                return {k: v for k, v in chat.__dict__.items() if not k.startswith('_')}
             return {k: v for k, v in chat.__dict__.items() if not k.startswith('_')}
+        data = await db_writer.run(write)
+        cls._cache.set(chat_id, CachedEntity(ChatRecord.from_row(data), data))
+        return dict(data)
 
     @classmethod
-    async def update(cls, chat_id: int, **kwargs) -> bool:
-        async with async_session() as session:
-            result = await session.execute(select(cls).filter_by(chat_id=chat_id))
-            chat = result.scalars().first()
-            if chat is None:
-                return False
-            for key, value in kwargs.items():
-                setattr(chat, key, value)
-            session.add(chat)
-            await session.commit()
-            await session.refresh(chat)
+    async def update(cls, chat_id: int, deferred: bool = False, **kwargs) -> bool:
+        """Update a chat; with deferred=True the write may be queued in write_behind."""
+        if deferred and write_behind.enabled:
+            # The ban gate is updated by the flush, once the change is committed
+            await write_behind.submit(cls, chat_id, update_values=kwargs)
             return True
+        async def write(session):
+            result = await session.execute(
+                update(cls.__table__)
+                .where(cls.chat_id == chat_id)
+                .values(**kwargs)
+                .returning(*cls.__table__.columns)
+            )
+            chat = result.mappings().first()
+            return dict(chat) if chat is not None else None
+        chat = await db_writer.run(write)
+        if chat is None:
+            return False
+        cls._cache.set(chat_id, CachedEntity(ChatRecord.from_row(chat), chat))
+        if "is_banned" in kwargs:
+            _track_ban(chat_id, chat["is_banned"])
+        return True
 
     @classmethod
     async def delete(cls, chat_id: int) -> bool:
-        async with async_session() as session:
+        async def write(session):
             result = await session.execute(select(cls).filter_by(chat_id=chat_id))
             chat = result.scalars().first()
             if chat is None:
                 return False
             await session.delete(chat)
-            await session.commit()
             return True
+        if not await db_writer.run(write):
+            return False
+        cls._cache.pop(chat_id)
+        AdminsPermissions._cache.pop(chat_id)
+        banned_ids.discard(chat_id)
+        return True
 
     @classmethod
     async def get(cls, chat_id: int) -> Optional[Dict[str, Any]]:
-        async with async_session() as session:
-            result = await session.execute(select(cls).filter_by(chat_id=chat_id))
-            chat = result.scalars().first()
-            if chat is None:
-                return None
-            return {k: v for k, v in chat.__dict__.items() if not k.startswith('_')}
+        """Return every column of a chat as a dict, served from cache when possible (see get_record)."""
+        cached = cls._cache.get(chat_id)
+        if cached is not None and cached.row is not None:
+            return dict(cached.row)
+        version = cls._cache.version()
+        async with engine.connect() as conn:
+            result = await conn.execute(select(cls.__table__).where(cls.chat_id == chat_id))
+            chat = result.mappings().first()
+        if chat is None:
+            return None
+        chat = dict(chat)
+        cls._cache.fill(chat_id, CachedEntity(ChatRecord.from_row(chat), chat), version)
+        return dict(chat)
+
+    @classmethod
+    async def get_record(cls, chat_id: int) -> Optional[ChatRecord]:
+        """Return the ChatRecord of a chat, served from cache when possible, or None if missing."""
+        cached = cls._cache.get(chat_id)
+        if cached is not None:
+            return cached.record
+        version = cls._cache.version()
+        async with engine.connect() as conn:
+            row = (await conn.execute(cls._record_query, {"key": chat_id})).first()
+        if row is None:
+            return None
+        record = ChatRecord(*row)
+        cls._cache.fill(chat_id, CachedEntity(record), version)
+        return record
+
+    @classmethod
+    async def page(cls, limit: int, after: Optional[int] = None, before: Optional[int] = None,
+                   **filters) -> Tuple[List[Dict[str, Any]], bool]:
+        """Return a page of chats for the admin panel; see keyset_page."""
+        columns = (cls.chat_id, cls.chat_type, cls.chat_title, cls.language, cls.is_active, cls.is_banned)
+        return await keyset_page(cls, cls.chat_id, columns, limit, after, before, **filters)
+
+    @classmethod
+    async def set_banned(cls, chat_ids: List[int], is_banned: bool) -> Dict[str, int]:
+        """Ban or unban many chats at once; see set_banned for the returned counts."""
+        return await set_banned(cls, cls.chat_id, chat_ids, is_banned)
+
+    @classmethod
+    async def set_inactive(cls, chat_ids: List[int]) -> List[int]:
+        """Mark many chats inactive at once and return those that were active."""
+        return await set_inactive(cls, cls.chat_id, chat_ids)
 
     @classmethod
     async def count(cls) -> int:
         async with async_session() as session:
-            result = await session.execute(select(func.count()).select_from(select(cls).subquery()))
+            result = await session.execute(select(func.count()).select_from(cls))
             return result.scalar_one()
 
     @classmethod
     async def count_by(cls, **kwargs) -> int:
         async with async_session() as session:
-            result = await session.execute(select(func.count()).select_from(select(cls).filter_by(**kwargs).subquery()))
+            result = await session.execute(select(func.count()).select_from(cls).filter_by(**kwargs))
             return result.scalar_one()
 
     @classmethod
-    async def chat_status_change(cls, chat_id: int, chat_type: str, chat_title: str, is_active: bool, is_admin: bool) -> bool:
-        async with async_session() as session:
-            result = await session.execute(select(cls).filter_by(chat_id=chat_id))
-            chat = result.scalars().first()
-            if chat is None:
-                chat = cls(chat_id=chat_id, chat_type=chat_type, chat_title=chat_title, is_active=is_active, is_admin=is_admin)
-                session.add(chat)
-            else:
-                chat.chat_type = chat_type
-                chat.chat_title = chat_title
-                chat.is_active = is_active
-                chat.is_admin = is_admin
-            await session.commit()
+    async def chat_status_change(cls, chat_id: int, chat_type: str, chat_title: str, is_active: bool, is_admin: bool,
+                                 deferred: bool = False) -> bool:
+        """Create or update a chat's membership state; with deferred=True the write may be queued in write_behind."""
+        values = dict(chat_type=chat_type, chat_title=chat_title, is_active=is_active, is_admin=is_admin)
+        if deferred and write_behind.enabled:
+            await write_behind.submit(cls, chat_id, insert_values=values, update_values=values)
             return True
+        stmt = upsert(cls.__table__).values(chat_id=chat_id, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.chat_id],
+            set_={key: stmt.excluded[key] for key in values}
+        ).returning(*cls.__table__.columns)
+        async def write(session):
+            result = await session.execute(stmt)
+            return dict(result.mappings().first())
+        chat = await db_writer.run(write)
+        cls._cache.set(chat_id, CachedEntity(ChatRecord.from_row(chat), chat))
+        return True
     
     @classmethod
     async def get_all(cls) -> List[Dict[str, Any]]:
@@ -135,17 +606,75 @@ class Chats(Base):
             chats = result.scalars().all()
             return [{k: v for k, v in chat.__dict__.items() if not k.startswith('_')} for chat in chats]
 
+    @classmethod
+    async def iter_all(cls, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield all chats as pages of plain dicts, ordered by chat_id."""
+        async for page in iter_table(cls, cls.chat_id, batch_size):
+            yield page
+
 
 class AdminsPermissions(Base):
     __tablename__ = 'admins_permissions'
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     admin_id = Column(Integer, index=True)
     chat_id = Column(Integer, ForeignKey('chats.chat_id', ondelete="CASCADE"), nullable=False)
-    privileges = Column(JSON, nullable=False)
+    # Bitmask of the privileges in tools.enums.PRIVILEGE_BITS
+    privileges_mask = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_admins_permissions_chat_admin", "chat_id", "admin_id", unique=True),
+    )
 
     # Relationship with Chats
     chat = relationship("Chats", back_populates="admins_permissions")
 
+    # Admin rosters keyed by chat_id: {admin_id: privileges_mask}
+    _cache = TTLCache(maxsize=ADMINS_CACHE_SIZE, ttl=ADMINS_CACHE_TTL)
+    # Concurrent roster refreshes of the same chat share one get_chat_members call
+    _refreshes = SingleFlight()
+    # Set by AdminsRefreshScheduler: stale rosters are then served and refreshed in the background
+    _background_refresh = False
+    _stale_chats: set = set()
+    # Chats with a recent permission check, most recent last, used to prioritize refreshes
+    _activity = TTLCache(maxsize=ADMINS_CACHE_SIZE, ttl=ADMINS_ACTIVITY_TTL)
+
+    @classmethod
+    async def refresh_admins(cls, client: Client, chat_id: int) -> AccessPermission:
+        """
+        Refetch the administrators of a chat from Telegram and store them.
+
+        Concurrent calls for the same chat are coalesced into a single fetch.
+
+        Args:
+            client: The Telegram client
+            chat_id: The chat ID to refresh
+
+        Returns:
+            AccessPermission: Status of the operation
+        """
+        async def fetch():
+            admin_list = [
+                (member.user.id, privileges_to_mask(member.privileges))
+                async for member in client.get_chat_members(
+                    chat_id=chat_id,
+                    filter=ChatMembersFilter.ADMINISTRATORS
+                )
+            ]
+            return await cls.create(client=client, chat_id=chat_id, admin_list=admin_list)
+        return await cls._refreshes.do(chat_id, fetch)
+
+    @classmethod
+    async def get_admins(cls, chat_id: int) -> Dict[int, int]:
+        """Return the admin roster of a chat as {admin_id: privileges_mask}, served from cache when possible."""
+        roster = cls._cache.get(chat_id)
+        if roster is not None:
+            return roster
+        async with async_session() as session:
+            result = await session.execute(select(cls.admin_id, cls.privileges_mask).filter_by(chat_id=chat_id))
+            roster = {admin_id: mask for admin_id, mask in result.all()}
+        cls._cache.set(chat_id, roster)
+        return roster
+
     @classmethod
     async def create(cls, client: Client, chat_id: int, admin_list: list[tuple[int, Any]]) -> AccessPermission:
         """
@@ -154,38 +683,41 @@ class AdminsPermissions(Base):
         Args:
             client: The client to use for the request
             chat_id: The chat ID to update permissions for
-            admin_list: List of (admin_id, ChatPrivileges) tuples
+            admin_list: List of (admin_id, privileges) tuples, privileges being a ChatPrivileges,
+                a {privilege: bool} dict or a mask
 
         Returns:
             AccessPermission: Status of the operation
         """
-        async with async_session() as session:
+        new_chat = None
+        if await Chats.get(chat_id) is None:
             try:
-                chat = await session.execute(select(Chats).filter_by(chat_id=chat_id))
-                chat = chat.scalars().first()
-                if chat is None:
-                    try:
-                        chat_info = await client.get_chat(chat_id)
-                        chat = Chats(chat_id=chat_id, chat_type=chat_info.type.value, chat_title=chat_info.title)
-                        session.add(chat)
-                        await session.commit()
-                    except (RPCError, ChannelPrivate, PeerIdInvalid, ValueError):
-                        return AccessPermission.CHAT_NOT_FOUND
-                await session.execute(delete(cls).filter_by(chat_id=chat_id))
-                for admin_id, privileges in admin_list:
-                    admin = cls(
-                        admin_id=admin_id,
-                        chat_id=chat_id,
-                        privileges=privileges
-                    )
-                    session.add(admin)
-                chat.last_admins_update = datetime.now()
-                await session.commit()
-                return True
-            except Exception as e:
-                await session.rollback()
-                logger.error(f"Error updating admin permissions: {e}")
-                raise   
+                chat_info = await client.get_chat(chat_id)
+            except (RPCError, ChannelPrivate, PeerIdInvalid, ValueError):
+                return AccessPermission.CHAT_NOT_FOUND
+            new_chat = dict(chat_id=chat_id, chat_type=chat_info.type.value, chat_title=chat_info.title)
+        roster = {admin_id: privileges_to_mask(privileges) for admin_id, privileges in admin_list}
+
+        async def write(session):
+            if new_chat is not None:
+                await session.execute(upsert(Chats.__table__).values(**new_chat)
+                                      .on_conflict_do_nothing(index_elements=[Chats.chat_id]))
+            await session.execute(delete(cls).filter_by(chat_id=chat_id))
+            if roster:
+                await session.execute(insert(cls.__table__), [
+                    {"chat_id": chat_id, "admin_id": admin_id, "privileges_mask": mask}
+                    for admin_id, mask in roster.items()
+                ])
+            await session.execute(update(Chats.__table__).where(Chats.chat_id == chat_id)
+                                  .values(last_admins_update=datetime.now()))
+        try:
+            await db_writer.run(write)
+        except Exception as e:
+            logger.error(f"Error updating admin permissions: {e}")
+            raise
+        Chats._cache.pop(chat_id)
+        cls._cache.set(chat_id, roster)
+        return True
     
     @classmethod
     async def update_admin(cls, chat_id: int, admin_id: int, privileges: Any) -> AccessPermission:
@@ -195,32 +727,30 @@ class AdminsPermissions(Base):
         Args:
             chat_id: The chat ID to update permissions for
             admin_id: The admin ID to update permissions for
-            privileges: The new admin privileges
+            privileges: The new admin privileges (ChatPrivileges, {privilege: bool} dict or mask)
 
         Returns:
             AccessPermission: Status of the operation
         """
-        async with async_session() as session:
-            try:
-                admin = await session.execute(select(cls).filter_by(chat_id=chat_id, admin_id=admin_id))
-                admin = admin.scalars().first()
-                if isinstance(privileges, ChatPrivileges):
-                    privileges = privileges.__dict__
-                elif isinstance(privileges, dict):
-                    pass
-                else:
-                    raise ValueError("Invalid privileges type")
-                if admin is None:
-                    admin = cls(chat_id=chat_id, admin_id=admin_id, privileges=privileges)
-                    session.add(admin)
-                else:
-                    admin.privileges = privileges
-                await session.commit()
-                return True
-            except Exception as e:
-                await session.rollback()
-                logger.error(f"Error updating admin permissions: {e}")
-                raise   
+        if not isinstance(privileges, (ChatPrivileges, dict, int)):
+            raise ValueError("Invalid privileges type")
+        mask = privileges_to_mask(privileges)
+        stmt = upsert(cls.__table__).values(chat_id=chat_id, admin_id=admin_id, privileges_mask=mask)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.chat_id, cls.admin_id],
+            set_={"privileges_mask": stmt.excluded.privileges_mask}
+        )
+        async def write(session):
+            await session.execute(stmt)
+        try:
+            await db_writer.run(write)
+        except Exception as e:
+            logger.error(f"Error updating admin permissions: {e}")
+            raise
+        roster = cls._cache.pop(chat_id)
+        if roster is not None:
+            cls._cache.set(chat_id, {**roster, admin_id: mask})
+        return True
     
     @classmethod
     async def delete_admin(cls, chat_id: int, admin_id: int) -> AccessPermission:
@@ -234,19 +764,20 @@ class AdminsPermissions(Base):
         Returns:
             AccessPermission: Status of the operation
         """
-        async with async_session() as session:
-            try:
-                admin = await session.execute(select(cls).filter_by(chat_id=chat_id, admin_id=admin_id))
-                admin = admin.scalars().first()
-                if admin is None:
-                    return False
-                await session.delete(admin)
-                await session.commit()
-                return True
-            except Exception as e:
-                await session.rollback()
-                logger.error(f"Error deleting admin permissions: {e}")
-                raise   
+        async def write(session):
+            result = await session.execute(delete(cls).filter_by(chat_id=chat_id, admin_id=admin_id))
+            return result.rowcount > 0
+        try:
+            deleted = await db_writer.run(write)
+        except Exception as e:
+            logger.error(f"Error deleting admin permissions: {e}")
+            raise
+        if not deleted:
+            return False
+        roster = cls._cache.pop(chat_id)
+        if roster is not None:
+            cls._cache.set(chat_id, {k: v for k, v in roster.items() if k != admin_id})
+        return True
     
     @classmethod
     async def is_admin(cls, client: Client, chat_id: int, admin_id: int, permission_required: str) -> AccessPermission:
@@ -262,86 +793,135 @@ class AdminsPermissions(Base):
         Returns:
             AccessPermission: Permission status
         """
+        try:
+            chat = await Chats.get_record(chat_id)
+            if chat is None:
+                try:
+                    chat_info = await client.get_chat(chat_id=chat_id)
+                    chat = ChatRecord.from_row(
+                        await Chats.create(chat_id=chat_id, chat_type=chat_info.type.value, chat_title=chat_info.title)
+                    )
+                except Exception:
+                    return AccessPermission.CHAT_NOT_FOUND
+            if not chat.is_admin:
+                return AccessPermission.BOT_NOT_ADMIN
+            cls._activity.set(chat_id, True)
+            last_admins_update = chat.last_admins_update
+            if not last_admins_update:
+                await cls.refresh_admins(client, chat_id)
+            elif last_admins_update < datetime.now() - timedelta(hours=24):
+                if cls._background_refresh:
+                    cls._stale_chats.add(chat_id)
+                else:
+                    await cls.refresh_admins(client, chat_id)
+            mask = (await cls.get_admins(chat_id)).get(admin_id)
+
+            if mask is None:
+                return AccessPermission.NOT_ADMIN
+            elif chat_id == admin_id:
+                return AccessPermission.ALLOW
+            elif mask & PRIVILEGE_BITS.get(permission_required, 0):
+                return AccessPermission.ALLOW
+            return AccessPermission.DENY
+        except (ChatInvalid, ChatAdminRequired, ChannelPrivate, PeerIdInvalid, ValueError) as e:
+            return AccessPermission.CHAT_NOT_FOUND
+        except Exception as e:
+            logger.error(f"Error in is_admin for chat {chat_id}, admin {admin_id}: {e}")
+            return AccessPermission.DENY
+
+    @classmethod
+    async def chats_with_privilege(cls, admin_id: int, privilege: str) -> List[int]:
+        """
+        Return the IDs of all chats where a user is admin with a given privilege.
+
+        Args:
+            admin_id: The user ID
+            privilege: A privilege name from tools.enums.PRIVILEGE_BITS (e.g. "can_restrict_members")
+
+        Returns:
+            List[int]: Matching chat IDs
+        """
+        bit = PRIVILEGE_BITS.get(privilege)
+        if bit is None:
+            raise ValueError(f"Unknown privilege: {privilege}")
         async with async_session() as session:
-            try:
-                chat = await session.execute(select(Chats).filter_by(chat_id=chat_id))
-                chat = chat.scalars().first()
-                if chat is None:
-                    try:
-                        chat_info = await client.get_chat(chat_id=chat_id)
-                        chat = Chats(chat_id=chat_id, chat_type=chat_info.type.value, chat_title=chat_info.title)
-                        session.add(chat)
-                        await session.commit()
-                        await session.refresh(chat)
-                    except Exception:
-                        return AccessPermission.CHAT_NOT_FOUND
-                if not chat.is_admin:
-                    return AccessPermission.BOT_NOT_ADMIN
-                elif not chat.last_admins_update or (chat.last_admins_update < datetime.now() - timedelta(hours=24)):
-                    admin_list = [
-                        (member.user.id, member.privileges.__dict__)
-                        async for member in client.get_chat_members(
-                            chat_id=chat_id,
-                            filter=ChatMembersFilter.ADMINISTRATORS
-                        )
-                    ]
-                    await cls.create(client=client, chat_id=chat_id, admin_list=admin_list)
-                    await session.refresh(chat)
-                admin = await session.execute(select(cls).filter_by(
-                    chat_id=chat_id,
-                    admin_id=admin_id
-                ))
-                admin = admin.scalars().first()
-
-                if admin is None:
-                    return AccessPermission.NOT_ADMIN
-                elif chat_id == admin_id:
-                    return AccessPermission.ALLOW
-                elif admin.privileges.get(permission_required) is None:
-                    return AccessPermission.DENY
-                elif admin.privileges.get(permission_required):
-                    return AccessPermission.ALLOW
-                return AccessPermission.DENY
-            except (ChatInvalid, ChatAdminRequired, ChannelPrivate, PeerIdInvalid, ValueError) as e:
-                return AccessPermission.CHAT_NOT_FOUND
-            except Exception as e:
-                logger.error(f"Error in is_admin for chat {chat_id}, admin {admin_id}: {e}")
-                return AccessPermission.DENY
+            result = await session.execute(
+                select(cls.chat_id).where(cls.admin_id == admin_id, cls.privileges_mask.op("&")(bit) != 0)
+            )
+            return list(result.scalars().all())
+
+    @classmethod
+    def migrate(cls, sync_conn) -> None:
+        """
+        Convert a pre-bitmask admins_permissions table in place.
+
+        Adds privileges_mask, fills it from the JSON privileges column, keeps only the
+        newest row per (chat_id, admin_id), creates the unique index and drops the
+        JSON column. Safe to run on every start.
+        """
+        columns = {column["name"] for column in inspect(sync_conn).get_columns(cls.__tablename__)}
+        if "privileges" in columns:
+            logger.info("Migrating admins_permissions privileges to bitmasks")
+            if "privileges_mask" not in columns:
+                sync_conn.exec_driver_sql(
+                    f"ALTER TABLE {cls.__tablename__} ADD COLUMN privileges_mask INTEGER NOT NULL DEFAULT 0"
+                )
+            rows = sync_conn.exec_driver_sql(f"SELECT id, privileges FROM {cls.__tablename__}").fetchall()
+            masks = [
+                {"id": row_id, "mask": privileges_to_mask(json.loads(value) if isinstance(value, str) else value)}
+                for row_id, value in rows
+            ]
+            if masks:
+                sync_conn.execute(
+                    update(cls.__table__)
+                    .where(cls.id == bindparam("row_id"))
+                    .values(privileges_mask=bindparam("mask")),
+                    [{"row_id": item["id"], "mask": item["mask"]} for item in masks]
+                )
+            sync_conn.exec_driver_sql(
+                f"DELETE FROM {cls.__tablename__} WHERE id NOT IN "
+                f"(SELECT MAX(id) FROM {cls.__tablename__} GROUP BY chat_id, admin_id)"
+            )
+            sync_conn.exec_driver_sql(f"ALTER TABLE {cls.__tablename__} DROP COLUMN privileges")
+        for index in cls.__table__.indexes:
+            index.create(sync_conn, checkfirst=True)
 
     @classmethod
     async def clear(cls, chat_id: int) -> bool:
         """Clear all admin permissions for a chat."""
-        async with async_session() as session:
-            try:
-                session.begin()
-                chat = await session.execute(select(Chats).filter_by(chat_id=chat_id))
-                chat = chat.scalars().first()
-                if chat is None:
-                    return False
-                await session.execute(delete(cls).filter_by(chat_id=chat_id))
-                chat.last_admins_update = None
-                await session.commit()
-                return True
-            except Exception as e:
-                session.rollback()
-                logger.error(f"Error clearing admin permissions: {e}")
+        async def write(session):
+            chat = await session.execute(select(Chats).filter_by(chat_id=chat_id))
+            chat = chat.scalars().first()
+            if chat is None:
                 return False
+            await session.execute(delete(cls).filter_by(chat_id=chat_id))
+            chat.last_admins_update = None
+            return True
+        try:
+            if not await db_writer.run(write):
+                return False
+        except Exception as e:
+            logger.error(f"Error clearing admin permissions: {e}")
+            return False
+        Chats._cache.pop(chat_id)
+        cls._cache.pop(chat_id)
+        return True
 
     @classmethod
     async def clear_all(cls) -> bool:
         """Clear all admin permissions from the database."""
-        async with async_session() as session:
-            try:
-                session.begin()
-                await session.execute(delete(cls))
-                # Reset all chat timestamps
-                await session.execute(update(Chats).values(last_admins_update=None))
-                await session.commit()
-                return True
-            except Exception as e:
-                session.rollback()
-                logger.error(f"Error clearing all admin permissions: {e}")
-                return False
+        async def write(session):
+            await session.execute(delete(cls))
+            # Reset all chat timestamps
+            await session.execute(update(Chats).values(last_admins_update=None))
+        try:
+            await db_writer.run(write)
+        except Exception as e:
+            logger.error(f"Error clearing all admin permissions: {e}")
+            return False
+        Chats._cache.clear()
+        cls._cache.clear()
+        return True
 
 
 class Users(Base):
@@ -354,18 +934,30 @@ class Users(Base):
     is_banned = Column(Boolean, default=False)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
-    
-    # wait_input is used to wait for user input
-    wait_input = Column(String, nullable=True)
+    # Pending user input (e.g. waiting for a ban ID) lives in tools.conversation
     # Add more columns as needed
 
+    # Read-through cache of CachedEntity(UserRecord, full row) keyed by user_id
+    _cache = TTLCache(maxsize=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
+
     @staticmethod
     async def create(user_id: int,
                username: str | None = None,
                full_name: str | None = None,
                language: str | None = None,
-               is_active: bool = True) -> bool:
-        async with async_session() as session:
+               is_active: bool = True,
+               deferred: bool = False) -> bool:
+        """
+        Create a user if it does not exist yet.
+
+        With deferred=True the insert may be queued in write_behind, in which case
+        True is returned without knowing whether the user already existed.
+        """
+        if deferred and write_behind.enabled:
+            values = dict(username=username, full_name=full_name, language=language, is_active=is_active)
+            await write_behind.submit(Users, user_id, insert_values=values)
+            return True
+        async def write(session):
             user = await session.execute(select(Users).filter_by(user_id=user_id))
             user = user.scalars().first()
             if user is None:
@@ -375,49 +967,82 @@ class Users(Base):
                              language=language,
                              is_active=is_active)
                 session.add(user)
-                await session.commit()
                 return True
             return False
+        created = await db_writer.run(write)
+        if created:
+            Users._cache.pop(user_id)
+        return created
 
     @staticmethod
     async def get(user_id: int) -> Optional[Dict[str, Any]]:
-        async with async_session() as session:
-            user = await session.execute(select(Users).filter_by(user_id=user_id))
-            user = user.scalars().first()
-            if user is None:
-                return False
-            return user.__dict__
+        """Return every column of a user as a dict, served from cache when possible (see get_record)."""
+        cached = Users._cache.get(user_id)
+        if cached is not None and cached.row is not None:
+            return dict(cached.row)
+        version = Users._cache.version()
+        async with engine.connect() as conn:
+            result = await conn.execute(select(Users.__table__).where(Users.user_id == user_id))
+            user = result.mappings().first()
+        if user is None:
+            return False
+        user = dict(user)
+        Users._cache.fill(user_id, CachedEntity(UserRecord.from_row(user), user), version)
+        return dict(user)
+
+    @staticmethod
+    async def get_record(user_id: int) -> Optional[UserRecord]:
+        """Return the UserRecord of a user, served from cache when possible, or None if missing."""
+        cached = Users._cache.get(user_id)
+        if cached is not None:
+            return cached.record
+        version = Users._cache.version()
+        async with engine.connect() as conn:
+            row = (await conn.execute(Users._record_query, {"key": user_id})).first()
+        if row is None:
+            return None
+        record = UserRecord(*row)
+        Users._cache.fill(user_id, CachedEntity(record), version)
+        return record
 
     @staticmethod
     async def update(user_id: int, **kwargs) -> Optional[Dict[str, Any]]:
-        async with async_session() as session:
-            user = await session.execute(select(Users).filter_by(user_id=user_id))
-            user = user.scalars().first()
-            if user is None:
-                return False
-            for key, value in kwargs.items():
-                setattr(user, key, value)
-            await session.commit()
-            await session.refresh(user)
-            return user.__dict__
+        async def write(session):
+            result = await session.execute(
+                update(Users.__table__)
+                .where(Users.user_id == user_id)
+                .values(**kwargs)
+                .returning(*Users.__table__.columns)
+            )
+            user = result.mappings().first()
+            return dict(user) if user is not None else None
+        data = await db_writer.run(write)
+        if data is None:
+            return False
+        Users._cache.set(user_id, CachedEntity(UserRecord.from_row(data), data))
+        if "is_banned" in kwargs:
+            _track_ban(user_id, data["is_banned"])
+        return dict(data)
 
     @staticmethod
     async def delete(user_id: int) -> bool:
-        async with async_session() as session:
-            user = await session.execute(select(Users).filter_by(user_id=user_id))
-            user = user.scalars().first()
-            if user is None:
-                return False
-            await session.delete(user)
-            await session.commit()
-            return True
+        async def write(session):
+            result = await session.execute(delete(Users).filter_by(user_id=user_id))
+            return result.rowcount > 0
+        if not await db_writer.run(write):
+            return False
+        Users._cache.pop(user_id)
+        banned_ids.discard(user_id)
+        return True
 
     @staticmethod
     async def delete_all() -> bool:
-        async with async_session() as session:
+        async def write(session):
             await session.execute(delete(Users))
-            await session.commit()
-            return True
+        await db_writer.run(write)
+        Users._cache.clear()
+        banned_ids.replace([entity_id for entity_id in banned_ids if entity_id < 0])
+        return True
 
     @classmethod
     async def get_all(cls) -> list:
@@ -427,6 +1052,29 @@ class Users(Base):
             # Convert SQLAlchemy objects to dictionaries and remove the _sa_instance_state key
             return [{k: v for k, v in user.__dict__.items() if not k.startswith('_')} for user in users]
 
+    @classmethod
+    async def iter_all(cls, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield all users as pages of plain dicts, ordered by user_id."""
+        async for page in iter_table(cls, cls.user_id, batch_size):
+            yield page
+
+    @classmethod
+    async def page(cls, limit: int, after: Optional[int] = None, before: Optional[int] = None,
+                   **filters) -> Tuple[List[Dict[str, Any]], bool]:
+        """Return a page of users for the admin panel; see keyset_page."""
+        columns = (cls.user_id, cls.username, cls.full_name, cls.language, cls.is_active, cls.is_banned)
+        return await keyset_page(cls, cls.user_id, columns, limit, after, before, **filters)
+
+    @classmethod
+    async def set_banned(cls, user_ids: List[int], is_banned: bool) -> Dict[str, int]:
+        """Ban or unban many users at once; see set_banned for the returned counts."""
+        return await set_banned(cls, cls.user_id, user_ids, is_banned)
+
+    @classmethod
+    async def set_inactive(cls, user_ids: List[int]) -> List[int]:
+        """Mark many users inactive at once and return those that were active."""
+        return await set_inactive(cls, cls.user_id, user_ids)
+
     @classmethod
     async def get_all_by(cls, **kwargs) -> list:
         async with async_session() as session:
@@ -447,6 +1095,312 @@ class Users(Base):
             return result.scalar() or 0
 
 
+Chats._record_query = record_query(Chats, ChatRecord, Chats.chat_id)
+Users._record_query = record_query(Users, UserRecord, Users.user_id)
+
+
+class Counters(Base):
+    """
+    Row counts maintained incrementally by database triggers.
+
+    Triggers on the users and chats tables keep ``<table>_total`` and
+    ``<table>_active`` up to date on every insert, delete and is_active change,
+    so reading statistics is a lookup instead of a table scan. ``reconcile``
+    recomputes them from the tables to correct any drift.
+    """
+    __tablename__ = 'counters'
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+    TABLES = ("users", "chats")
+    NAMES = tuple(f"{table}_{kind}" for table in TABLES for kind in ("total", "active"))
+
+    @classmethod
+    def supported(cls) -> bool:
+        return engine.dialect.name in ("sqlite", "postgresql")
+
+    @classmethod
+    def _trigger_ddl(cls, dialect: str) -> List[str]:
+        statements = []
+        for table in cls.TABLES:
+            total, active = f"{table}_total", f"{table}_active"
+            if dialect == "sqlite":
+                statements += [
+                    f"""CREATE TRIGGER IF NOT EXISTS {table}_counters_insert AFTER INSERT ON {table} BEGIN
+                        UPDATE counters SET value = value + 1 WHERE name = '{total}';
+                        UPDATE counters SET value = value + COALESCE(NEW.is_active, 0) WHERE name = '{active}';
+                    END""",
+                    f"""CREATE TRIGGER IF NOT EXISTS {table}_counters_delete AFTER DELETE ON {table} BEGIN
+                        UPDATE counters SET value = value - 1 WHERE name = '{total}';
+                        UPDATE counters SET value = value - COALESCE(OLD.is_active, 0) WHERE name = '{active}';
+                    END""",
+                    f"""CREATE TRIGGER IF NOT EXISTS {table}_counters_update AFTER UPDATE OF is_active ON {table}
+                    WHEN NEW.is_active IS NOT OLD.is_active BEGIN
+                        UPDATE counters SET value = value + COALESCE(NEW.is_active, 0) - COALESCE(OLD.is_active, 0)
+                        WHERE name = '{active}';
+                    END""",
+                ]
+            elif dialect == "postgresql":
+                statements += [
+                    f"""CREATE OR REPLACE FUNCTION {table}_counters() RETURNS trigger AS $$
+                    BEGIN
+                        IF TG_OP = 'INSERT' THEN
+                            UPDATE counters SET value = value + 1 WHERE name = '{total}';
+                            UPDATE counters SET value = value + COALESCE(NEW.is_active, false)::int
+                            WHERE name = '{active}';
+                        ELSIF TG_OP = 'DELETE' THEN
+                            UPDATE counters SET value = value - 1 WHERE name = '{total}';
+                            UPDATE counters SET value = value - COALESCE(OLD.is_active, false)::int
+                            WHERE name = '{active}';
+                        ELSE
+                            UPDATE counters
+                            SET value = value + COALESCE(NEW.is_active, false)::int
+                                              - COALESCE(OLD.is_active, false)::int
+                            WHERE name = '{active}';
+                        END IF;
+                        RETURN NULL;
+                    END $$ LANGUAGE plpgsql""",
+                    f"DROP TRIGGER IF EXISTS {table}_counters ON {table}",
+                    f"""CREATE TRIGGER {table}_counters AFTER INSERT OR DELETE OR UPDATE OF is_active ON {table}
+                    FOR EACH ROW EXECUTE FUNCTION {table}_counters()""",
+                ]
+        return statements
+
+    @classmethod
+    async def install(cls, conn) -> None:
+        """Create the counter rows and triggers (idempotent)."""
+        if not cls.supported():
+            return
+        await conn.execute(upsert(cls.__table__).values([{"name": name, "value": 0} for name in cls.NAMES])
+                           .on_conflict_do_nothing(index_elements=[cls.name]))
+        for statement in cls._trigger_ddl(engine.dialect.name):
+            await conn.exec_driver_sql(statement)
+
+    @classmethod
+    async def reconcile(cls) -> Dict[str, int]:
+        """Recompute every counter from its table and return the drift that was corrected."""
+        if not cls.supported():
+            return {}
+        before = await cls.get_all()
+        async def write(session):
+            for table in cls.TABLES:
+                await session.execute(text(
+                    f"UPDATE counters SET value = (SELECT COUNT(*) FROM {table}) WHERE name = '{table}_total'"
+                ))
+                await session.execute(text(
+                    f"UPDATE counters SET value = (SELECT COUNT(*) FROM {table} WHERE is_active) "
+                    f"WHERE name = '{table}_active'"
+                ))
+        await db_writer.run(write)
+        after = await cls.get_all()
+        drift = {name: after[name] - before.get(name, 0) for name in after if after[name] != before.get(name, 0)}
+        if drift:
+            logger.warning(f"Counters drift corrected: {drift}")
+        return drift
+
+    @classmethod
+    async def reconcile_periodically(cls, interval: float) -> None:
+        """Run reconcile every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await cls.reconcile()
+            except Exception as e:
+                logger.error(f"Error reconciling counters: {e}")
+
+    @classmethod
+    async def get_all(cls) -> Dict[str, int]:
+        """Return all counters by name (computed with COUNT queries on unsupported dialects)."""
+        if not cls.supported():
+            return {
+                "users_total": await Users.count(),
+                "users_active": await Users.count_by(is_active=True),
+                "chats_total": await Chats.count(),
+                "chats_active": await Chats.count_by(is_active=True),
+            }
+        async with async_session() as session:
+            result = await session.execute(select(cls.name, cls.value))
+            return {name: value for name, value in result.all()}
+
+
+class SearchIndex:
+    """
+    Full-text search over user names and chat titles.
+
+    On SQLite with FTS5 each searchable table gets an external-content
+    ``<table>_fts`` index kept in sync by triggers, and searches are prefix
+    MATCH queries ranked by bm25. Elsewhere, searches fall back to a
+    case-insensitive LIKE prefix scan.
+    """
+    # table -> (key column, searchable columns, bm25 weights)
+    TABLES = {
+        "users": ("user_id", ("username", "full_name"), (2.0, 1.0)),
+        "chats": ("chat_id", ("chat_title",), (1.0,)),
+    }
+    # Set by install once FTS5 is known to be available
+    _fts = False
+
+    @classmethod
+    def supported(cls) -> bool:
+        """True when searches use the FTS5 index rather than the LIKE fallback."""
+        return cls._fts
+
+    @classmethod
+    def _trigger_ddl(cls, table: str) -> List[str]:
+        key, columns, _ = cls.TABLES[table]
+        names = ", ".join(columns)
+        new = ", ".join(f"new.{column}" for column in columns)
+        old = ", ".join(f"old.{column}" for column in columns)
+        return [
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {table}_fts(rowid, {names}) VALUES (new.{key}, {new});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', old.{key}, {old});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {names} ON {table} BEGIN
+                INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', old.{key}, {old});
+                INSERT INTO {table}_fts(rowid, {names}) VALUES (new.{key}, {new});
+            END""",
+        ]
+
+    @classmethod
+    async def install(cls, conn) -> None:
+        """Create the FTS5 tables and triggers (idempotent), indexing existing rows on first creation."""
+        if engine.dialect.name != "sqlite":
+            return
+        if not (await conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+            logger.warning("SQLite was built without FTS5, search falls back to LIKE prefix queries")
+            return
+        for table, (key, columns, _) in cls.TABLES.items():
+            exists = (await conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f"{table}_fts",)
+            )).first()
+            await conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({', '.join(columns)}, "
+                f"content='{table}', content_rowid='{key}', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            for statement in cls._trigger_ddl(table):
+                await conn.exec_driver_sql(statement)
+            if not exists:
+                await conn.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        cls._fts = True
+
+    @classmethod
+    async def rebuild(cls) -> float:
+        """Rebuild the FTS5 indexes from their tables and return the seconds it took (0 without FTS5)."""
+        if not cls._fts:
+            return 0.0
+        started = time.perf_counter()
+
+        async def write(session):
+            for table in cls.TABLES:
+                await session.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+        await db_writer.run(write)
+        return time.perf_counter() - started
+
+    @staticmethod
+    def _match_query(query: str) -> str:
+        """Turn free text into an FTS5 query matching every word as a prefix."""
+        words = [word.replace('"', "") for word in query.lstrip("@").split()]
+        return " ".join(f'"{word}"*' for word in words if word)
+
+    @classmethod
+    async def search(cls, table: str, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Search users ("users") or chats ("chats") by name words.
+
+        Returns:
+            List[Dict[str, Any]]: Matching rows, best match first
+        """
+        key, columns, weights = cls.TABLES[table]
+        if cls._fts:
+            match = cls._match_query(query)
+            if not match:
+                return []
+            # Rank only the first SEARCH_CANDIDATES matches, so very common words stay fast
+            stmt = text(
+                f"SELECT t.{key}, {', '.join(f't.{column}' for column in columns)}, t.is_active, t.is_banned "
+                f"FROM (SELECT rowid, bm25({table}_fts, {', '.join(str(weight) for weight in weights)}) AS score "
+                f"FROM {table}_fts WHERE {table}_fts MATCH :match LIMIT :candidates) m "
+                f"JOIN {table} t ON t.{key} = m.rowid "
+                f"ORDER BY m.score LIMIT :limit"
+            )
+            params = {"match": match, "candidates": SEARCH_CANDIDATES, "limit": limit}
+        else:
+            model_table = Base.metadata.tables[table]
+            prefix = query.lstrip("@").strip().lower()
+            if not prefix:
+                return []
+            pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            stmt = (
+                select(model_table.c[key], *(model_table.c[column] for column in columns),
+                       model_table.c.is_active, model_table.c.is_banned)
+                .where(or_(*(func.lower(model_table.c[column]).like(pattern, escape="\\") for column in columns)))
+                .order_by(model_table.c[key])
+                .limit(limit)
+            )
+            params = {}
+        async with engine.connect() as conn:
+            result = await conn.execute(stmt, params)
+            return [dict(row) for row in result.mappings()]
+
+
+class Broadcasts(Base):
+    """
+    Progress of owner broadcasts, so a job interrupted by a restart resumes where it stopped.
+
+    ``cursor`` is the last recipient key of the last fully sent page; recipients
+    are read in key order, so resuming continues right after it.
+    """
+    __tablename__ = 'broadcasts'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    target = Column(String, nullable=False)
+    from_chat_id = Column(Integer, nullable=False)
+    message_id = Column(Integer, nullable=False)
+    # running, done or cancelled
+    status = Column(String, nullable=False, default="running")
+    cursor = Column(Integer, nullable=True)
+    total = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    blocked = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    language = Column(String, nullable=True)
+    status_chat_id = Column(Integer, nullable=True)
+    status_message_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    @classmethod
+    async def create(cls, **values) -> Dict[str, Any]:
+        async def write(session):
+            result = await session.execute(insert(cls.__table__).values(**values).returning(cls.__table__))
+            return dict(result.mappings().one())
+        return await db_writer.run(write)
+
+    @classmethod
+    async def save(cls, broadcast_id: int, **values) -> None:
+        """Persist the progress columns of a broadcast."""
+        async def write(session):
+            await session.execute(update(cls.__table__).where(cls.id == broadcast_id).values(**values))
+        await db_writer.run(write)
+
+    @classmethod
+    async def get(cls, broadcast_id: int) -> Optional[Dict[str, Any]]:
+        async with engine.connect() as conn:
+            row = (await conn.execute(select(cls.__table__).where(cls.id == broadcast_id))).mappings().first()
+        return dict(row) if row else None
+
+    @classmethod
+    async def running(cls) -> List[Dict[str, Any]]:
+        """Return the broadcasts that have not finished, oldest first."""
+        async with engine.connect() as conn:
+            result = await conn.execute(select(cls.__table__).where(cls.status == "running").order_by(cls.id))
+            return [dict(row) for row in result.mappings()]
+
+
 class BotSettings(Base):
     __tablename__ = 'bot_settings'
 
@@ -465,6 +1419,8 @@ class BotSettings(Base):
     # Cache for settings
     _instance = None
     _last_fetch = 0
+    # Incremented on every settings change, so rendered keyboards can be invalidated
+    _version = 0
     CACHE_TTL = 60 * 60 * 24  # Cache for 24 hours
 
     @classmethod
@@ -481,6 +1437,7 @@ class BotSettings(Base):
         """Update the cache with new settings"""
         cls._instance = settings
         cls._last_fetch = time.time()
+        cls._version += 1
 
     @classmethod
     async def get_settings(cls, force_refresh: bool = False) -> 'BotSettings':
@@ -495,62 +1452,240 @@ class BotSettings(Base):
         async with async_session() as session:
             result = await session.execute(select(cls).limit(1))
             settings = result.scalars().first()
-            
-            if not settings:
-                settings = cls()
-                session.add(settings)
-                await session.commit()
-                await session.refresh(settings)
 
-            # Update cache
-            cls._update_cache(settings)
-            return settings
+        if not settings:
+            settings = await db_writer.run(cls._get_or_create)
+
+        # Update cache
+        cls._update_cache(settings)
+        return settings
+
+    @classmethod
+    async def _get_or_create(cls, session) -> 'BotSettings':
+        """Return the settings record of a writer session, creating it if missing."""
+        result = await session.execute(select(cls).limit(1))
+        settings = result.scalars().first()
+        if not settings:
+            settings = cls()
+            session.add(settings)
+            await session.flush()
+            await session.refresh(settings)
+        return settings
 
     @classmethod
     async def update_settings(cls, **kwargs) -> 'BotSettings':
         """Update settings with the provided values"""
-        async with async_session() as session:
-            result = await session.execute(select(cls).limit(1))
-            settings = result.scalars().first()
-            
-            if not settings:
-                settings = cls()
-                session.add(settings)
-                await session.commit()
-                await session.refresh(settings)
-
+        async def write(session):
+            settings = await cls._get_or_create(session)
             for key, value in kwargs.items():
                 if hasattr(settings, key):
                     setattr(settings, key, value)
-
-            await session.commit()
+            await session.flush()
             await session.refresh(settings)
-            # Update cache
-            cls._update_cache(settings)
             return settings
+        settings = await db_writer.run(write)
+        # Update cache
+        cls._update_cache(settings)
+        return settings
 
     @classmethod
     async def switch_settings(cls, key: str) -> 'BotSettings':
         """Switch the value of a setting"""
-        async with async_session() as session:
-            settings = await session.execute(select(cls).limit(1))
-            settings = settings.scalars().first()
-            
-            if not settings:
-                settings = cls()
-                session.add(settings)
-
+        async def write(session):
+            settings = await cls._get_or_create(session)
             if hasattr(settings, key):
                 setattr(settings, key, not getattr(settings, key))
-
-            await session.commit()
+            await session.flush()
             await session.refresh(settings)
-            # Update cache
-            cls._update_cache(settings)
             return settings
+        settings = await db_writer.run(write)
+        # Update cache
+        cls._update_cache(settings)
+        return settings
+
+
+class WriteBehindQueue:
+    """
+    Optional write-behind buffer for metadata writes nobody needs to read back at once.
+
+    Writes are coalesced per (model, primary key): the last value of each column
+    wins, and a pending insert keeps its insert-if-missing semantics. The queue is
+    flushed in a single transaction every ``interval_ms`` or as soon as
+    ``batch_size`` rows are pending. When ``max_backlog`` rows are pending the
+    submitting coroutine flushes inline, which throttles producers to the speed
+    of the database.
+    """
+
+    def __init__(self, enabled: bool, interval_ms: int, batch_size: int, max_backlog: int, max_attempts: int):
+        self.enabled = enabled
+        self.interval = interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_backlog = max_backlog
+        self.max_attempts = max_attempts
+        # (model, primary key) -> [insert values or None, update values, failed flushes]
+        self._pending: Dict[tuple, list] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.batches = 0
+        self.requeued = 0
+        self.dropped = 0
+
+    async def submit(self, model, key: Any, insert_values: Optional[Dict[str, Any]] = None,
+                     update_values: Optional[Dict[str, Any]] = None) -> None:
+        """Queue an insert-if-missing and/or update of one row."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self._pending) >= self.max_backlog and (model, key) not in self._pending:
+            await self.flush()
+
+        self.submitted += 1
+        entry = self._pending.get((model, key))
+        if entry is None:
+            self._pending[(model, key)] = [dict(insert_values) if insert_values is not None else None,
+                                           dict(update_values or {}), 0]
+        else:
+            self.coalesced += 1
+            if insert_values is not None:
+                entry[0] = {**(entry[0] or {}), **insert_values}
+            entry[1].update(update_values or {})
+        model._cache.pop(key)
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    @staticmethod
+    def _statement(model, key: Any, insert_values: Optional[Dict[str, Any]], update_values: Dict[str, Any]):
+        table = model.__table__
+        pk = next(iter(table.primary_key.columns))
+        if insert_values is None:
+            return update(table).where(pk == key).values(**update_values)
+        stmt = upsert(table).values({pk.name: key, **insert_values, **update_values})
+        if update_values:
+            return stmt.on_conflict_do_update(index_elements=[pk], set_=update_values)
+        return stmt.on_conflict_do_nothing(index_elements=[pk])
+
+    async def flush(self) -> int:
+        """
+        Write every pending row in one transaction and return how many were written.
+
+        If the batch fails, each row is retried in its own transaction, so one bad
+        row cannot discard the others. Rows that still fail go back to the queue
+        and are dropped, with an error, after ``max_attempts`` failed flushes.
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            try:
+                written = await self._write(pending)
+            except Exception as e:
+                logger.warning(f"Error flushing {len(pending)} write-behind rows, retrying them one by one: {e}")
+                written = 0
+                for item in pending.items():
+                    try:
+                        written += await self._write(dict([item]))
+                    except Exception as error:
+                        self._requeue(*item, error=error)
+            else:
+                self.batches += 1
+            finally:
+                for model, key in pending:
+                    model._cache.pop(key)
+            self.flushed += written
+            return written
+
+    async def _write(self, rows: Dict[tuple, list]) -> int:
+        """Write rows in one writer transaction, then mirror committed ban changes in the ban gate."""
+        async def write(session):
+            bans = []
+            for (model, key), (insert_values, update_values, _) in rows.items():
+                result = await session.execute(self._statement(model, key, insert_values, update_values))
+                if "is_banned" in update_values and result.rowcount:
+                    bans.append((key, update_values["is_banned"]))
+            return bans
+        for key, is_banned in await db_writer.run(write):
+            _track_ban(key, is_banned)
+        return len(rows)
+
+    def _requeue(self, model_key: tuple, entry: list, error: Exception) -> None:
+        """Put a row that failed to write back in the queue, under any values submitted since."""
+        insert_values, update_values, attempts = entry
+        if attempts + 1 >= self.max_attempts:
+            self.dropped += 1
+            logger.error(f"Dropping write-behind row {model_key[0].__tablename__}:{model_key[1]} "
+                         f"after {attempts + 1} failed flushes: {error}")
+            return
+        newer = self._pending.get(model_key)
+        if newer is not None:
+            if newer[0] is not None:
+                insert_values = {**(insert_values or {}), **newer[0]}
+            update_values = {**update_values, **newer[1]}
+        self._pending[model_key] = [insert_values, update_values, attempts + 1]
+        self.requeued += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        """Stop the background flusher and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "requeued": self.requeued,
+            "dropped": self.dropped,
+        }
+
+
+write_behind = WriteBehindQueue(
+    enabled=WRITE_BEHIND_ENABLED,
+    interval_ms=WRITE_BEHIND_INTERVAL_MS,
+    batch_size=WRITE_BEHIND_BATCH_SIZE,
+    max_backlog=WRITE_BEHIND_MAX_BACKLOG,
+    max_attempts=WRITE_BEHIND_MAX_ATTEMPTS
+)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Return counters of the entity and roster caches, roster refreshes, the writers and the ban gate."""
+    return {
+        "users": Users._cache.stats(),
+        "chats": Chats._cache.stats(),
+        "admins": AdminsPermissions._cache.stats(),
+        "admin_refreshes": AdminsPermissions._refreshes.stats(),
+        "writer": db_writer.stats(),
+        "write_behind": write_behind.stats(),
+        "ban_gate": banned_ids.stats(),
+    }
 
 
 async def create_tables():
     async with engine.begin() as conn:
         logger.info("Database tables initialized successfully")
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(AdminsPermissions.migrate)
+        await Counters.install(conn)
+        await SearchIndex.install(conn)
+    await Counters.reconcile()
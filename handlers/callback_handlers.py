@@ -13,7 +13,7 @@ async def select_language_handler(_, callback_query: CallbackQuery):
         await callback_query.answer(Messages(language="en").language_not_supported.format(language, supported_langs))
         return
 
-    if not (await Users.get(user_id=user_id)):
+    if not (await Users.get_record(user_id)):
         full_name = callback_query.from_user.full_name
         username = callback_query.from_user.username
         await Users.create(user_id=user_id, full_name=full_name, username=username, language=language)
@@ -21,7 +21,7 @@ async def select_language_handler(_, callback_query: CallbackQuery):
         await Users.update(user_id=user_id, language=language)
 
     messages = Messages(language=language)
-    language_name = messages.messages[language]['language']
+    language_name = messages.language_name()
     await callback_query.edit_message_text(messages.language_set.format(language_name))
 
 
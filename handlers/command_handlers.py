@@ -1,5 +1,5 @@
 from tools.enums import Messages
-from tools.inline_keyboards import select_language_buttons
+from tools.inline_keyboards import select_language_buttons, render_cached
 from pyrogram import Client
 from pyrogram.types import Message
 from pyrogram.enums import ChatType
@@ -14,11 +14,15 @@ async def start_handler(client: Client, message: Message, language: str):
     await message.reply(Messages(language=language).start.format(client.me.full_name))
 
 
+def render_help(language: str) -> str:
+    messages = Messages(language=language)
+    commands_str = "\n".join([f"/{command} - {description}" for command, description in messages.commands.items()])
+    return messages.help.format(commands_str)
+
+
 @with_language
 async def help_handler(_, message: Message, language: str):
-    commands = Messages(language=language).commands
-    commands_str = "\n".join([f"/{command} - {description}" for command, description in commands.items()])
-    await message.reply(Messages(language=language).help.format(commands_str))
+    await message.reply(render_cached(("help", language), lambda: render_help(language)))
 
 
 @is_admin_message()
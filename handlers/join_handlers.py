@@ -37,6 +37,7 @@ async def handle_bot_membership_update(member: ChatMemberUpdated) -> None:
         chat_type=chat.type.value,
         is_active=is_active and can_stay,
         is_admin=is_admin and can_stay,
+        deferred=True
     )
 
 
@@ -10,9 +10,10 @@ async def service_message_handler(client: Client, message: Message):
         chat_id = message.chat.id
         new_title = message.new_chat_title
         chat_type = message.chat.type.value
-        Chats.update(chat_id=chat_id,
-                     chat_type=chat_type,
-                     chat_title=new_title)
+        await Chats.update(chat_id=chat_id,
+                           chat_type=chat_type,
+                           chat_title=new_title,
+                           deferred=True)
 
 
 message_handlers = [MessageHandler(service_message_handler, filters.service)]
@@ -3,15 +3,18 @@ import asyncio
 from dotenv import load_dotenv
 from pyrogram import Client, idle
 from tools.logger import logger
-from database import create_tables, BotSettings
+from database import create_tables, load_banned_ids, BotSettings, Counters, write_behind, db_writer, admins_refresher
 from tools.tools import register_handlers
+from tools.conversation import conversations
+from tools.enums import locale_watcher
+from tools.outbound import OUTBOUND_SCHEDULER, outbound
 from handlers import (
     commands_handlers,
     callback_query_handlers,
     join_handlers,
     message_handlers
 )
-from bot import settings_handlers, settings_callback_handlers
+from bot import settings_handlers, settings_callback_handlers, broadcast_handlers, broadcaster, stats_handlers
 
 
 load_dotenv()
@@ -23,6 +26,7 @@ token = os.getenv("BOT_TOKEN")
 bot_client_name = os.getenv("BOT_CLIENT_NAME", "bot")
 bot_owner_id = os.getenv("BOT_OWNER_ID")
 skip_updates = os.getenv("SKIP_UPDATES", False)
+counters_reconcile_hours = float(os.getenv("COUNTERS_RECONCILE_HOURS", 24))
 
 
 if not api_id or not api_hash or not token or not bot_client_name:
@@ -30,6 +34,8 @@ if not api_id or not api_hash or not token or not bot_client_name:
 
 
 app = Client(bot_client_name, api_id=api_id, api_hash=api_hash, bot_token=token, skip_updates=skip_updates)
+if OUTBOUND_SCHEDULER:
+    outbound.install(app)
 
 
 register_handlers(
@@ -38,6 +44,8 @@ register_handlers(
     callback_query_handlers,
     settings_handlers,
     settings_callback_handlers,
+    broadcast_handlers,
+    stats_handlers,
     join_handlers,
     message_handlers
     # add list of handler see example https://github.com/sudo-py-dev/telegram-bot-template/blob/main/handlers/join_handlers.py#L64
@@ -45,13 +53,23 @@ register_handlers(
 
 
 async def main():
+    background_tasks = []
     try:
         # Initialize database first
         await create_tables()
+        banned = await load_banned_ids()
+        logger.info(f"Ban gate loaded with {banned} banned IDs")
+        conversations.load_snapshot()
+        background_tasks.append(asyncio.create_task(Counters.reconcile_periodically(counters_reconcile_hours * 3600)))
+        background_tasks.append(locale_watcher.start())
 
         await app.start()
         me = await app.get_me()
         logger.info(f"Bot https://t.me/{me.username} is now running!")
+        admins_refresher.start(app)
+        resumed = await broadcaster.resume(app)
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished broadcasts")
         
         # Get bot settings
         bot_settings = await BotSettings.get_settings()
@@ -73,9 +91,18 @@ async def main():
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}", exc_info=True)
     finally:
+        for task in background_tasks:
+            task.cancel()
+        conversations.save_snapshot()
+        await broadcaster.close()
+        await admins_refresher.stop()
         if app.is_connected:
+            # Handlers still running may wait on queued replies, so the scheduler closes after the client
             await app.stop()
             logger.success("Bot stopped successfully")
+        await outbound.close()
+        await write_behind.close()
+        await db_writer.close()
 
 
 if __name__ == "__main__":
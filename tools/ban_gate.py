@@ -0,0 +1,102 @@
+from typing import Iterable, Set, Union
+from pyrogram import Client, StopPropagation
+from pyrogram.enums import ChatMemberStatus, ChatType
+from pyrogram.filters import create
+from pyrogram.handlers import (CallbackQueryHandler, ChatJoinRequestHandler, ChatMemberUpdatedHandler,
+                               MessageHandler)
+from pyrogram.types import CallbackQuery, ChatJoinRequest, ChatMemberUpdated, Message
+from tools.logger import logger
+
+
+class BannedIds:
+    """
+    In-memory set of banned user and chat IDs.
+
+    User IDs are positive and group/channel IDs negative, so both share one set.
+    It is loaded once at startup (``database.load_banned_ids``) and kept in sync
+    by ``Users.update`` / ``Chats.update`` whenever ``is_banned`` changes.
+    """
+
+    def __init__(self):
+        self._ids: Set[int] = set()
+        self.dropped = 0
+
+    def __contains__(self, entity_id: int) -> bool:
+        return entity_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(tuple(self._ids))
+
+    def add(self, *entity_ids: int) -> None:
+        self._ids.update(entity_ids)
+
+    def discard(self, *entity_ids: int) -> None:
+        self._ids.difference_update(entity_ids)
+
+    def replace(self, entity_ids: Iterable[int]) -> None:
+        self._ids = set(entity_ids)
+
+    def stats(self) -> dict:
+        return {"banned": len(self._ids), "dropped": self.dropped}
+
+
+banned_ids = BannedIds()
+
+GateUpdate = Union[Message, CallbackQuery, ChatMemberUpdated, ChatJoinRequest]
+
+
+def _update_chat(update: GateUpdate):
+    if isinstance(update, CallbackQuery):
+        return update.message.chat if update.message else None
+    return update.chat
+
+
+async def _is_banned(_, __, update: GateUpdate) -> bool:
+    user = update.from_user
+    # Membership changes made by a banned user in a chat that is not banned (promoting admins,
+    # removing or re-adding the bot) still have to reach the admin and chat status bookkeeping
+    if user is not None and user.id in banned_ids and not isinstance(update, ChatMemberUpdated):
+        return True
+    chat = _update_chat(update)
+    return chat is not None and chat.id in banned_ids
+
+
+banned_filter = create(_is_banned, name="Banned")
+
+
+def _should_leave(update: GateUpdate) -> bool:
+    """Leave banned groups when they talk to the bot or add it back."""
+    chat = _update_chat(update)
+    if chat is None or chat.id not in banned_ids or chat.type == ChatType.PRIVATE:
+        return False
+    if isinstance(update, Message):
+        return True
+    if isinstance(update, ChatMemberUpdated):
+        member = update.new_chat_member
+        return (member is not None and member.user is not None and member.user.is_self
+                and member.status in (ChatMemberStatus.MEMBER, ChatMemberStatus.ADMINISTRATOR))
+    return False
+
+
+async def ban_gate(client: Client, update: GateUpdate):
+    """Drop an update from a banned user or chat before any other handler group runs."""
+    banned_ids.dropped += 1
+    if _should_leave(update):
+        chat_id = _update_chat(update).id
+        try:
+            await client.leave_chat(chat_id)
+        except Exception as e:
+            logger.warning(f"Error leaving banned chat {chat_id}: {e}")
+    raise StopPropagation
+
+
+# Registered by register_handlers in group -1, ahead of every other handler
+ban_gate_handlers = [
+    MessageHandler(ban_gate, banned_filter),
+    CallbackQueryHandler(ban_gate, banned_filter),
+    ChatMemberUpdatedHandler(ban_gate, banned_filter),
+    ChatJoinRequestHandler(ban_gate, banned_filter),
+]
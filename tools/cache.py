@@ -0,0 +1,123 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry expiry and LRU eviction.
+
+    Entries older than ``ttl`` seconds are treated as missing, and once the cache
+    holds ``maxsize`` entries the least recently used one is evicted to make room.
+    Hit, miss, eviction and expiration counters are kept for monitoring.
+
+    Read-through callers take ``version()`` before reading the source and store
+    the result with ``fill``, which drops it if ``set``, ``pop`` or ``clear``
+    touched the key meanwhile, so a stale read never overwrites a newer write.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_fills = 0
+        # Invalidation version of the most recently changed keys, oldest first
+        self._version = 0
+        self._changed: "OrderedDict[Hashable, int]" = OrderedDict()
+        # Newest version no longer tracked per key; keys not in _changed may have changed up to it
+        self._forgotten = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _invalidate(self, key: Hashable) -> None:
+        self._version += 1
+        self._changed[key] = self._version
+        self._changed.move_to_end(key)
+        if len(self._changed) > max(self.maxsize, 1):
+            self._forgotten = self._changed.popitem(last=False)[1]
+
+    def version(self) -> int:
+        """Return the current invalidation version, to pass to fill after reading the source."""
+        return self._version
+
+    def fill(self, key: Hashable, value: Any, version: int) -> bool:
+        """Store a value read since version() returned ``version``, unless key changed meanwhile."""
+        if self._changed.get(key, self._forgotten) > version:
+            self.stale_fills += 1
+            return False
+        self._store(key, value)
+        return True
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the least recently used entry if full."""
+        self._invalidate(key)
+        self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key from the cache and return its value (expired or not)."""
+        self._invalidate(key)
+        item = self._data.pop(key, _MISSING)
+        if item is _MISSING:
+            return default
+        return item[1]
+
+    def clear(self) -> None:
+        """Drop every entry, keeping the counters."""
+        self._data.clear()
+        self._version += 1
+        self._forgotten = self._version
+        self._changed.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        item = self._data.get(key, _MISSING)
+        return item is not _MISSING and item[0] >= time.monotonic()
+
+    def keys(self) -> List[Hashable]:
+        """Return the keys that have not expired, least recently used first, without touching the counters."""
+        now = time.monotonic()
+        return [key for key, (expires_at, _) in self._data.items() if expires_at >= now]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """Return a snapshot of the cache counters."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "stale_fills": self.stale_fills,
+        }
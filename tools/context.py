@@ -0,0 +1,60 @@
+from typing import Any, Dict, Optional, Union
+from pyrogram.types import CallbackQuery, Message
+from database import Chats, ChatRecord, UserRecord, Users
+
+
+class UpdateContext:
+    """
+    Per-update store of the user and chat records needed while handling one update.
+
+    Filters and decorators run one after another on the same pyrogram object, so the
+    context is attached to it and every row is read at most once per update.
+    """
+
+    __slots__ = ("_users", "_chats", "_chat_rows")
+
+    def __init__(self):
+        self._users: Dict[int, Optional[UserRecord]] = {}
+        self._chats: Dict[int, Optional[ChatRecord]] = {}
+        self._chat_rows: Dict[int, Optional[Dict[str, Any]]] = {}
+
+    async def user(self, user_id: int) -> Optional[UserRecord]:
+        """Return the user record (loaded on first access), or None if missing."""
+        if user_id not in self._users:
+            self._users[user_id] = await Users.get_record(user_id)
+        return self._users[user_id]
+
+    async def chat(self, chat_id: int) -> Optional[ChatRecord]:
+        """Return the chat record (loaded on first access), or None if missing."""
+        if chat_id not in self._chats:
+            self._chats[chat_id] = await Chats.get_record(chat_id)
+        return self._chats[chat_id]
+
+    async def chat_row(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Return every column of the chat as a dict (loaded on first access), or None if missing."""
+        if chat_id not in self._chat_rows:
+            self._chat_rows[chat_id] = await Chats.get(chat_id)
+        return self._chat_rows[chat_id]
+
+    def set_user(self, user_id: int, user: Optional[UserRecord]) -> None:
+        self._users[user_id] = user
+
+    def set_chat(self, chat_id: int, chat: Optional[ChatRecord]) -> None:
+        self._chats[chat_id] = chat
+        self._chat_rows.pop(chat_id, None)
+
+    def forget_user(self, user_id: int) -> None:
+        self._users.pop(user_id, None)
+
+    def forget_chat(self, chat_id: int) -> None:
+        self._chats.pop(chat_id, None)
+        self._chat_rows.pop(chat_id, None)
+
+
+def get_context(update: Union[Message, CallbackQuery]) -> UpdateContext:
+    """Return the UpdateContext attached to an update, creating it on first use."""
+    context = getattr(update, "_update_context", None)
+    if context is None:
+        context = UpdateContext()
+        update._update_context = context
+    return context
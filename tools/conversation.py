@@ -0,0 +1,80 @@
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+from tools.logger import logger
+
+
+class ConversationStore:
+    """
+    In-memory conversation state (e.g. "waiting for a ban ID") keyed by user ID.
+
+    Lookups are a single dict access so handler filters can check it on every
+    private message without touching the database. States expire after ``ttl``
+    seconds, and the store can be snapshotted to a JSON file across restarts.
+    """
+
+    def __init__(self, ttl: float = 900, snapshot_path: Optional[str] = None):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        # user_id -> (state, expires_at as a unix timestamp)
+        self._states: Dict[int, Tuple[str, float]] = {}
+
+    def get(self, user_id: int) -> Optional[str]:
+        """Return the pending state of a user, or None if there is none or it expired."""
+        item = self._states.get(user_id)
+        if item is None:
+            return None
+        state, expires_at = item
+        if expires_at < time.time():
+            del self._states[user_id]
+            return None
+        return state
+
+    def set(self, user_id: int, state: str) -> None:
+        """Start (or replace) the pending state of a user."""
+        self._states[user_id] = (state, time.time() + self.ttl)
+
+    def clear(self, user_id: int) -> None:
+        """Forget the pending state of a user."""
+        self._states.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def save_snapshot(self) -> bool:
+        """Write the non-expired states to snapshot_path, if configured."""
+        if not self.snapshot_path:
+            return False
+        now = time.time()
+        data = {str(user_id): [state, expires_at]
+                for user_id, (state, expires_at) in self._states.items() if expires_at >= now}
+        try:
+            with open(self.snapshot_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            return True
+        except OSError as e:
+            logger.error(f"Error saving conversation snapshot {self.snapshot_path}: {e}")
+            return False
+
+    def load_snapshot(self) -> int:
+        """Restore non-expired states from snapshot_path and return how many were loaded."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading conversation snapshot {self.snapshot_path}: {e}")
+            return 0
+        now = time.time()
+        for user_id, (state, expires_at) in data.items():
+            if expires_at >= now:
+                self._states[int(user_id)] = (state, expires_at)
+        return len(self._states)
+
+
+conversations = ConversationStore(
+    ttl=int(os.getenv("CONVERSATION_TTL", 900)),
+    snapshot_path=os.getenv("CONVERSATION_SNAPSHOT")
+)
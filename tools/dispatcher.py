@@ -0,0 +1,142 @@
+import asyncio
+import itertools
+import os
+from typing import Any, Dict, List, Optional
+from pyrogram import Client, utils
+from pyrogram.dispatcher import Dispatcher
+from tools.logger import logger
+from tools.outbound import set_handler_path
+
+
+# Ordered update queues; 0 keeps pyrogram's own unordered worker pool, unset uses Client.workers
+DISPATCHER_SHARDS = os.getenv("DISPATCHER_SHARDS")
+
+
+def update_chat_id(update: Any) -> Optional[int]:
+    """Return the chat ID of a raw update (same value as the parsed update's chat.id), or None if it has none."""
+    try:
+        message = getattr(update, "message", None)
+        if getattr(message, "peer_id", None) is not None:
+            return utils.get_peer_id(message.peer_id)
+        if getattr(update, "peer", None) is not None:
+            return utils.get_peer_id(update.peer)
+        if getattr(update, "channel_id", None) is not None:
+            return utils.get_channel_id(update.channel_id)
+        if getattr(update, "chat_id", None) is not None:
+            return -update.chat_id
+        return getattr(update, "user_id", None)
+    except ValueError:
+        return None
+
+
+class _ShardView:
+    """A dispatcher as seen by one shard worker: its own queue, everything else shared."""
+
+    def __init__(self, dispatcher: Dispatcher, queue: asyncio.Queue):
+        self._dispatcher = dispatcher
+        self.updates_queue = queue
+
+    def __getattr__(self, name):
+        return getattr(self._dispatcher, name)
+
+
+async def _shard_worker(view: _ShardView, lock: asyncio.Lock) -> None:
+    # Handler sends that would wait on a rate limit are queued instead, so one chat cannot stall its shard
+    set_handler_path(True)
+    await Dispatcher.handler_worker(view, lock)
+
+
+class ShardedDispatcher:
+    """
+    Run pyrogram's handlers per chat in order and across chats in parallel.
+
+    A router task moves each incoming update from the client's queue to one of
+    ``shards`` queues, picked by chat ID, and each queue has a single worker
+    running pyrogram's own handler loop. So two updates of one chat never run
+    at the same time and are handled in arrival order. Updates of chats on
+    different shards run concurrently. Updates without a chat go to the shards
+    in turn. A slow handler only delays the chats that share its shard.
+    """
+
+    def __init__(self, shards: Optional[int] = None):
+        self.shards = shards
+        self._client: Optional[Client] = None
+        self._queues: List[asyncio.Queue] = []
+        self._max_depths: List[int] = []
+        self._router: Optional[asyncio.Task] = None
+        self._round_robin = itertools.count()
+        self.routed = 0
+        self.unordered = 0
+
+    def install(self, client: Client) -> None:
+        """Replace the start/stop of the client's dispatcher so updates go through the shards."""
+        if self.shards is None:
+            self.shards = client.workers
+        if self.shards <= 0 or client.no_updates:
+            return
+        self._client = client
+        client.dispatcher.start = self.start
+        client.dispatcher.stop = self.stop
+        logger.info(f"Sharded dispatcher installed with {self.shards} ordered queues")
+
+    def shard_of(self, chat_id: Optional[int]) -> int:
+        if chat_id is None:
+            self.unordered += 1
+            return next(self._round_robin) % self.shards
+        return chat_id % self.shards
+
+    async def start(self) -> None:
+        dispatcher = self._client.dispatcher
+        loop = asyncio.get_running_loop()
+        self._queues = [asyncio.Queue() for _ in range(self.shards)]
+        self._max_depths = [0] * self.shards
+        for queue in self._queues:
+            # add_handler takes every worker lock, so handlers never change under a running update
+            lock = asyncio.Lock()
+            dispatcher.locks_list.append(lock)
+            dispatcher.handler_worker_tasks.append(
+                loop.create_task(_shard_worker(_ShardView(dispatcher, queue), lock))
+            )
+        self._router = loop.create_task(self._route(dispatcher.updates_queue))
+        logger.info(f"Started {self.shards} ordered update shards")
+        if not self._client.skip_updates:
+            await self._client.recover_gaps()
+
+    async def _route(self, updates_queue: asyncio.Queue) -> None:
+        while True:
+            packet = await updates_queue.get()
+            updates_queue.task_done()
+            if packet is None:
+                for queue in self._queues:
+                    queue.put_nowait(None)
+                return
+            index = self.shard_of(update_chat_id(packet[0]))
+            queue = self._queues[index]
+            queue.put_nowait(packet)
+            self.routed += 1
+            if queue.qsize() > self._max_depths[index]:
+                self._max_depths[index] = queue.qsize()
+
+    async def stop(self) -> None:
+        dispatcher = self._client.dispatcher
+        dispatcher.updates_queue.put_nowait(None)
+        await self._router
+        await asyncio.gather(*dispatcher.handler_worker_tasks)
+        dispatcher.handler_worker_tasks.clear()
+        dispatcher.locks_list.clear()
+        dispatcher.groups.clear()
+        logger.info(f"Stopped {self.shards} ordered update shards")
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [queue.qsize() for queue in self._queues]
+        return {
+            "shards": self.shards,
+            "routed": self.routed,
+            "unordered": self.unordered,
+            "depths": depths,
+            "max_depths": list(self._max_depths),
+            "busiest_shard": max(range(len(depths)), key=depths.__getitem__) if depths else None,
+        }
+
+
+sharded_dispatcher = ShardedDispatcher(shards=int(DISPATCHER_SHARDS) if DISPATCHER_SHARDS else None)
@@ -1,6 +1,10 @@
 
 import os
 import json
+import time
+import asyncio
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
 from tools.logger import logger
 from enum import Enum
 
@@ -17,75 +21,206 @@ def load_json(file_path: str) -> dict:
 
 
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-messages = load_json(os.path.join(base_dir, "locales", "messages.json"))
-privileges = load_json(os.path.join(base_dir, "locales", "privileges.json"))
-
-
-class Messages:
-    def __init__(self, language: str = "he"):
-        self.language = language
-        self.messages = dict(messages)
+MESSAGES_PATH = os.path.join(base_dir, "locales", "messages.json")
+PRIVILEGES_PATH = os.path.join(base_dir, "locales", "privileges.json")
+messages = load_json(MESSAGES_PATH)
+privileges = load_json(PRIVILEGES_PATH)
+
+# Bit layout of AdminsPermissions.privileges_mask (the ChatPrivileges attribute names).
+# Stored masks depend on this order: only append new privileges to the end.
+PRIVILEGE_NAMES = (
+    "can_manage_chat", "can_delete_messages", "can_delete_stories", "can_manage_video_chats",
+    "can_restrict_members", "can_promote_members", "can_change_info", "can_post_messages",
+    "can_post_stories", "can_edit_messages", "can_edit_stories", "can_invite_users",
+    "can_pin_messages", "can_manage_topics", "is_anonymous", "can_manage_direct_messages",
+    "can_manage_tags",
+)
+PRIVILEGE_BITS = {name: 1 << index for index, name in enumerate(PRIVILEGE_NAMES)}
+
+
+def privileges_to_mask(value) -> int:
+    """Encode a ChatPrivileges object, a {privilege: bool} dict or an existing mask as an int."""
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    if isinstance(value, dict):
+        return sum(bit for name, bit in PRIVILEGE_BITS.items() if value.get(name))
+    return sum(bit for name, bit in PRIVILEGE_BITS.items() if getattr(value, name, False))
+
+
+def mask_to_privileges(mask: int) -> dict:
+    """Decode a privileges mask into a {privilege: bool} dict."""
+    return {name: bool(mask & bit) for name, bit in PRIVILEGE_BITS.items()}
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    return value
+
+
+def compile_catalog(source: dict, fallback: str = "en") -> Dict[str, Mapping[str, Any]]:
+    """Merge every language over the fallback language once and freeze the result."""
+    base = source.get(fallback, {})
+    return {language: _freeze({**base, **entries}) for language, entries in source.items()}
+
+
+class _CatalogView:
+    """
+    Read-only view of one language of a compiled catalog.
+
+    Instances are cached per language, and attribute access is a single lookup
+    in entries that already include the English fallback.
+    """
+    __slots__ = ("language", "_entries")
+    _catalog: Dict[str, Mapping[str, Any]] = {}
+    _instances: Dict[str, "_CatalogView"] = {}
+    _missing = "'{}' not found"
+
+    def __new__(cls, language: str = "he"):
+        instance = cls._instances.get(language)
+        if instance is None:
+            instance = super().__new__(cls)
+            object.__setattr__(instance, "language", language)
+            object.__setattr__(instance, "_entries", cls._catalog.get(language) or cls._catalog.get("en", {}))
+            cls._instances[language] = instance
+        return instance
 
     def __getattr__(self, name):
-        if self.language and name in self.messages.get(self.language, {}):
-            return self.messages[self.language][name]
-        else:
-            # Fallback to English if the message doesn't exist in the current language
-            if name in self.messages.get("en", {}):
-                return self.messages["en"][name]
-            else:
-                return f"Message '{name}' not found"
+        try:
+            return self._entries[name]
+        except KeyError:
+            return self._missing.format(name)
 
     def __setattr__(self, name, value):
-        if name == 'language' or name == 'messages':
-            super().__setattr__(name, value)
-        else:
-            # Handle dynamic message setting
-            if hasattr(self, 'language') and hasattr(self, 'messages') and self.language:
-                if self.language in self.messages and name in self.messages[self.language]:
-                    self.messages[self.language][name] = value
-                elif self.language in self.messages:
-                    self.messages[self.language][name] = value
-                # Don't set as instance attribute for message keys
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+
+class Messages(_CatalogView):
+    __slots__ = ()
+    _catalog = compile_catalog(messages)
+    _instances = {}
+    _missing = "Message '{}' not found"
+    # Incremented whenever the catalog is replaced, so rendered texts can be invalidated
+    version = 0
 
     def languages(self):
         """Return a list of all available language codes."""
-        return list(self.messages.keys())
-    
+        return list(self._catalog.keys())
+
     def languages_names(self):
         """Return a list of all available language names."""
-        return [self.messages[language]['language'] for language in self.messages]
-
+        return [entries['language'] for entries in self._catalog.values()]
 
-class PrivilegesMessages:
-    def __init__(self, language: str = "he"):
-        self.language = language
-        self.privileges = dict(privileges)
+    def language_name(self):
+        """Return the display name of this instance's language."""
+        return self._entries['language']
 
-    def __getattr__(self, name):
-        if self.language and name in self.privileges.get(self.language, {}):
-            return self.privileges[self.language][name]
-        else:
-            # Fallback to English if the message doesn't exist in the current language
-            if name in self.privileges.get("en", {}):
-                return self.privileges["en"][name]
-            else:
-                return f"Privilege '{name}' not found"
 
-    def __setattr__(self, name, value):
-        if name == 'language' or name == 'privileges':
-            super().__setattr__(name, value)
-        else:
-            # Handle dynamic message setting
-            if hasattr(self, 'language') and hasattr(self, 'privileges') and self.language:
-                if self.language in self.privileges and name in self.privileges[self.language]:
-                    self.privileges[self.language][name] = value
-                elif self.language in self.privileges:
-                    self.privileges[self.language][name] = value
-                # Don't set as instance attribute for message keys
+class PrivilegesMessages(_CatalogView):
+    __slots__ = ()
+    _catalog = compile_catalog(privileges)
+    _instances = {}
+    _missing = "Privilege '{}' not found"
 
     def exists_privilege(self, privilege: str) -> bool:
-        return privilege in self.privileges.get(self.language, {})
+        return privilege in self._entries
+
+
+def validate_catalog(source: Any, file_path: str) -> None:
+    """Raise ValueError unless source is {language: {key: value}} with an English section."""
+    if not isinstance(source, dict) or not source:
+        raise ValueError(f"{file_path}: expected a non-empty object of languages")
+    if "en" not in source:
+        raise ValueError(f"{file_path}: missing the 'en' fallback language")
+    for language, entries in source.items():
+        if not isinstance(entries, dict):
+            raise ValueError(f"{file_path}: language '{language}' must be an object")
+
+
+def build_catalogs() -> Tuple[Dict[str, Mapping[str, Any]], Dict[str, Mapping[str, Any]]]:
+    """Read, validate and compile both locale files (blocking; run it off the event loop)."""
+    compiled = []
+    for file_path in (MESSAGES_PATH, PRIVILEGES_PATH):
+        with open(file_path, "r", encoding="utf-8") as f:
+            source = json.load(f)
+        validate_catalog(source, file_path)
+        compiled.append(compile_catalog(source))
+    missing_names = [language for language, entries in compiled[0].items() if "language" not in entries]
+    if missing_names:
+        raise ValueError(f"{MESSAGES_PATH}: languages without a 'language' name: {missing_names}")
+    return compiled[0], compiled[1]
+
+
+def install_catalogs(messages_catalog: Dict[str, Mapping[str, Any]],
+                     privileges_catalog: Dict[str, Mapping[str, Any]]) -> None:
+    """
+    Swap in new compiled catalogs.
+
+    Runs without awaiting, so every handler sees either the old or the new catalog.
+    """
+    Messages._catalog = messages_catalog
+    Messages._instances = {}
+    PrivilegesMessages._catalog = privileges_catalog
+    PrivilegesMessages._instances = {}
+    Messages.version += 1
+
+
+class LocaleWatcher:
+    """Poll the locale files' modification times and hot-reload them when they change."""
+
+    def __init__(self, interval: float = 5):
+        self.interval = interval
+        self._mtimes = self._current_mtimes()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+
+    @staticmethod
+    def _current_mtimes() -> Tuple[float, ...]:
+        return tuple(os.stat(path).st_mtime if os.path.exists(path) else 0.0
+                     for path in (MESSAGES_PATH, PRIVILEGES_PATH))
+
+    async def reload(self) -> float:
+        """
+        Compile the locale files in a worker thread and swap them in.
+
+        Returns:
+            float: Seconds spent reading and compiling
+
+        Raises:
+            ValueError, OSError: If a file is unreadable or invalid; the current catalog is kept
+        """
+        async with self._lock:
+            mtimes = self._current_mtimes()
+            started = time.perf_counter()
+            catalogs = await asyncio.to_thread(build_catalogs)
+            elapsed = time.perf_counter() - started
+            install_catalogs(*catalogs)
+            self._mtimes = mtimes
+            self.reloads += 1
+            logger.info(f"Locale files reloaded in {elapsed * 1000:.1f}ms")
+            return elapsed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._current_mtimes() == self._mtimes:
+                continue
+            try:
+                await self.reload()
+            except Exception as e:
+                # Remember the broken version so it is not recompiled on every poll
+                self._mtimes = self._current_mtimes()
+                logger.error(f"Error reloading locale files, keeping the current ones: {e}")
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+
+locale_watcher = LocaleWatcher(interval=float(os.getenv("LOCALES_POLL_INTERVAL", 5)))
 
 
 class AccessPermission(Enum):
@@ -0,0 +1,106 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "ndjson").lower()
+EXPORT_GZIP = os.getenv("EXPORT_GZIP", "false").lower() in ("1", "true", "yes")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+# Telegram accepts bot uploads up to 2000 MB; keep a margin for the gzip buffer
+EXPORT_MAX_PART_SIZE = int(os.getenv("EXPORT_MAX_PART_MB", 1950)) * 1024 * 1024
+
+
+def _serialize_value(value):
+    """Recursively serialize values to be JSON-compatible."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    elif isinstance(value, dict):
+        return {k: _serialize_value(v) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_serialize_value(item) for item in value]
+    return value
+
+
+def _csv_value(value):
+    value = _serialize_value(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class StreamingExporter:
+    """
+    Incremental NDJSON/CSV writer that rolls over to a new part file at a size limit.
+
+    Rows are written page by page, so memory use does not depend on the table size.
+    All methods do blocking file I/O and are meant to be run in a worker thread
+    (``asyncio.to_thread``).
+    """
+
+    def __init__(self, directory: str, base_name: str, fmt: str = EXPORT_FORMAT,
+                 compress: bool = EXPORT_GZIP, max_part_size: int = EXPORT_MAX_PART_SIZE):
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unsupported export format: {fmt}")
+        self.directory = directory
+        self.base_name = base_name
+        self.fmt = fmt
+        self.compress = compress
+        self.max_part_size = max_part_size
+        self.rows = 0
+        self.parts = 0
+        self._raw = None
+        self._stream = None
+        self._csv = None
+        self._path: Optional[str] = None
+
+    @property
+    def extension(self) -> str:
+        return f".{self.fmt}" + (".gz" if self.compress else "")
+
+    def _open_part(self, fieldnames: List[str]) -> None:
+        self.parts += 1
+        self._path = os.path.join(self.directory, f"{self.base_name}_part{self.parts}{self.extension}")
+        self._raw = open(self._path, "wb")
+        binary = gzip.GzipFile(fileobj=self._raw, mode="wb") if self.compress else self._raw
+        self._stream = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+        if self.fmt == "csv":
+            self._csv = csv.DictWriter(self._stream, fieldnames=fieldnames)
+            self._csv.writeheader()
+
+    def _close_part(self) -> Optional[str]:
+        if self._stream is None:
+            return None
+        self._stream.close()
+        if self.compress:
+            self._raw.close()
+        path = self._path
+        self._raw = self._stream = self._csv = self._path = None
+        return path
+
+    def _part_size(self) -> int:
+        # Bytes already on disk; text and gzip buffers are covered by the size margin
+        return self._raw.tell()
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """Append rows and return the paths of part files completed meanwhile."""
+        completed = []
+        for row in rows:
+            if self._stream is None:
+                self._open_part(list(row.keys()))
+            if self.fmt == "csv":
+                self._csv.writerow({k: _csv_value(v) for k, v in row.items()})
+            else:
+                self._stream.write(json.dumps(_serialize_value(row), ensure_ascii=False))
+                self._stream.write("\n")
+            self.rows += 1
+            if self.rows % 100 == 0 and self._part_size() >= self.max_part_size:
+                completed.append(self._close_part())
+        return completed
+
+    def close(self) -> Optional[str]:
+        """Finish the current part file and return its path (None if nothing was written)."""
+        return self._close_part()
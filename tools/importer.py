@@ -0,0 +1,265 @@
+"""
+Import users or chats from an export file (NDJSON, CSV or a JSON array, optionally gzipped).
+
+Runs inside the bot (owner uploads a file with the caption ``/import``) or offline:
+
+    python -m tools.importer users users_export_part1.ndjson.gz
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import JSON, Boolean, DateTime, Integer
+from database import Chats, Users, load_banned_ids
+from database.database import db_writer, upsert
+from tools.logger import logger
+
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 5000))
+
+IMPORT_MODELS = {"users": Users, "chats": Chats}
+
+
+def _open_text(path: str) -> io.TextIOBase:
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8-sig", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+
+def _file_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lower()
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if extension in (".csv", ".json"):
+        return extension[1:]
+    raise ValueError(f"Unsupported import file type: {os.path.basename(path)}")
+
+
+def _iter_json_array(stream: io.TextIOBase, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("JSON import file must contain an array of rows")
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                raise ValueError("Truncated JSON import file")
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+        if len(buffer) < chunk_size:
+            buffer += stream.read(chunk_size)
+
+
+def _iter_raw_rows(stream: io.TextIOBase, fmt: str) -> Iterator[Optional[Dict[str, Any]]]:
+    """Yield each row as a dict, or None for an NDJSON line that is not a JSON object."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "json":
+        for item in _iter_json_array(stream):
+            yield item if isinstance(item, dict) else None
+    else:
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            yield item if isinstance(item, dict) else None
+
+
+def _coerce(column, value: Any) -> Any:
+    """Convert an exported value (CSV values are all strings) back to the column's type."""
+    if value is None or (isinstance(value, str) and value == "" and not column.primary_key):
+        return None
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in ("true", "1", "yes", "t"):
+            return True
+        if text in ("false", "0", "no", "f"):
+            return False
+        raise ValueError(f"{column.name}: not a boolean: {value!r}")
+    if isinstance(column_type, Integer):
+        if isinstance(value, bool):
+            raise ValueError(f"{column.name}: not an integer: {value!r}")
+        return int(value)
+    if isinstance(column_type, DateTime):
+        return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if isinstance(column_type, JSON):
+        return json.loads(value) if isinstance(value, str) else value
+    return str(value)
+
+
+def _default(column) -> Any:
+    default = column.default
+    if default is not None and default.is_scalar:
+        return default.arg
+    if isinstance(column.type, DateTime) and default is not None:
+        # Same value SQLite's CURRENT_TIMESTAMP (func.now()) would store
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    return None
+
+
+class RowValidator:
+    """Validate export rows against a model's table and fill in missing columns with defaults."""
+
+    def __init__(self, model):
+        self.columns = list(model.__table__.columns)
+        self.key = next(iter(model.__table__.primary_key.columns))
+
+    def __call__(self, row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Return the row ready for insertion, or None if it is invalid."""
+        if row is None or row.get(self.key.name) in (None, ""):
+            return None
+        try:
+            return {
+                column.name: _coerce(column, row[column.name]) if column.name in row else _default(column)
+                for column in self.columns
+            }
+        except (TypeError, ValueError):
+            return None
+
+
+class ImportReport:
+    """Counters of one import run."""
+
+    def __init__(self, table: str):
+        self.table = table
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "read": self.read,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "seconds": round(self.seconds, 2),
+            "rows_per_second": round(self.rows_per_second),
+        }
+
+
+class _BatchReader:
+    """Blocking reader handing out validated batches; every call runs in a worker thread."""
+
+    def __init__(self, path: str, validator: RowValidator, report: ImportReport):
+        self._stream = _open_text(path)
+        self._rows = _iter_raw_rows(self._stream, _file_format(path))
+        self._validator = validator
+        self._report = report
+
+    def next_batch(self, size: int) -> List[Dict[str, Any]]:
+        batch = []
+        for raw in self._rows:
+            self._report.read += 1
+            row = self._validator(raw)
+            if row is None:
+                self._report.invalid += 1
+            else:
+                batch.append(row)
+            if len(batch) >= size:
+                break
+        return batch
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+def detect_table(path: str) -> str:
+    """Guess "users" or "chats" from the key column of the first row of an export file."""
+    with _open_text(path) as stream:
+        for row in _iter_raw_rows(stream, _file_format(path)):
+            if row is None:
+                continue
+            if "user_id" in row:
+                return "users"
+            if "chat_id" in row:
+                return "chats"
+            break
+    raise ValueError("Cannot tell whether the file holds users or chats")
+
+
+async def import_file(path: str, table: Optional[str] = None, batch_size: int = IMPORT_BATCH_SIZE) -> ImportReport:
+    """
+    Stream an export file into the users or chats table.
+
+    Rows are validated and inserted in batches of ``batch_size`` with one
+    executemany INSERT ... ON CONFLICT DO NOTHING per writer transaction, so
+    rows whose ID already exists are skipped and counted as duplicates.
+    """
+    table = table or await asyncio.to_thread(detect_table, path)
+    if table not in IMPORT_MODELS:
+        raise ValueError(f"Unknown import table: {table}")
+    model = IMPORT_MODELS[table]
+    key = next(iter(model.__table__.primary_key.columns))
+    stmt = upsert(model.__table__).on_conflict_do_nothing(index_elements=[key])
+    report = ImportReport(table)
+    reader = await asyncio.to_thread(_BatchReader, path, RowValidator(model), report)
+    started = time.perf_counter()
+    try:
+        while True:
+            batch = await asyncio.to_thread(reader.next_batch, batch_size)
+            if not batch:
+                break
+
+            async def write(session):
+                result = await session.execute(stmt, batch)
+                return result.rowcount
+            inserted = await db_writer.run(write)
+            report.inserted += inserted
+            report.duplicates += len(batch) - inserted
+    finally:
+        await asyncio.to_thread(reader.close)
+        report.seconds = time.perf_counter() - started
+        model._cache.clear()
+        await load_banned_ids()
+    logger.info(f"Imported {table}: {report.as_dict()}")
+    return report
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from database import create_tables
+    await create_tables()
+    try:
+        for path in args.files:
+            report = await import_file(path, None if args.table == "auto" else args.table, args.batch_size)
+            print(json.dumps({"file": path, **report.as_dict()}))
+    finally:
+        await db_writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import users or chats from export files into the bot database")
+    parser.add_argument("table", choices=["users", "chats", "auto"], help="Target table (auto: detect from the file)")
+    parser.add_argument("files", nargs="+", help=".ndjson/.jsonl/.csv/.json files, optionally .gz")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Rows per transaction")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,15 +1,37 @@
+from typing import Any, Callable, Dict, Hashable, Optional
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from tools.enums import Messages
 from database import BotSettings
 
 
+# Rendered keyboards and texts, valid for one (catalog version, settings version)
+_render_cache: Dict[Hashable, Any] = {}
+_render_versions = None
+
+
+def render_cached(key: Hashable, build: Callable[[], Any]) -> Any:
+    """Return the cached rendering for key, building it once per catalog and settings version."""
+    global _render_versions
+    versions = (Messages.version, BotSettings._version)
+    if versions != _render_versions:
+        _render_cache.clear()
+        _render_versions = versions
+    rendered = _render_cache.get(key)
+    if rendered is None:
+        rendered = _render_cache[key] = build()
+    return rendered
+
+
 def select_language_buttons():
+    return render_cached(("select_language",), _build_select_language_buttons)
+
+
+def _build_select_language_buttons():
     messages = Messages()
     buttons = []
     row = []
 
-    for i, lang in enumerate(messages.languages(), start=1):
-        language_name = messages.languages_names()[i-1]
+    for i, (lang, language_name) in enumerate(zip(messages.languages(), messages.languages_names()), start=1):
         row.append(InlineKeyboardButton(
             language_name,
             callback_data=f"lang:{lang}"
@@ -34,6 +56,11 @@ def buttons_builder(name, data):
 
 
 def bot_settings_buttons(bot_settings: BotSettings, language: str):
+    key = ("bot_settings", language, bot_settings.can_join_group, bot_settings.can_join_channel)
+    return render_cached(key, lambda: _build_bot_settings_buttons(bot_settings, language))
+
+
+def _build_bot_settings_buttons(bot_settings: BotSettings, language: str):
     messages = Messages(language=language)
     
     buttons = [
@@ -52,12 +79,24 @@ def bot_settings_buttons(bot_settings: BotSettings, language: str):
             )
         ],
         
+        # Browse buttons
+        [
+            InlineKeyboardButton(text=messages.browse_users_button, callback_data="bot:list:u:all"),
+            InlineKeyboardButton(text=messages.browse_chats_button, callback_data="bot:list:c:all")
+        ],
+
         # Export buttons
         [
             InlineKeyboardButton(text=messages.export_users_button, callback_data="bot:users"),
             InlineKeyboardButton(text=messages.export_chats_button, callback_data="bot:chats")
         ],
         
+        # Broadcast buttons
+        [
+            InlineKeyboardButton(text=messages.broadcast_users_button, callback_data="bot:bc:users"),
+            InlineKeyboardButton(text=messages.broadcast_chats_button, callback_data="bot:bc:chats")
+        ],
+
         # Ban/Unban actions
         [
             InlineKeyboardButton(text=messages.banid_button, callback_data="bot:banid"),
@@ -66,3 +105,45 @@ def bot_settings_buttons(bot_settings: BotSettings, language: str):
     ]
     
     return InlineKeyboardMarkup(buttons)
+
+
+# Chat types offered as filters in the chats list
+LIST_CHAT_TYPES = ("group", "supergroup", "channel")
+
+
+def list_buttons(table: str, filter_token: str, language: str,
+                 prev_cursor: Optional[int], next_cursor: Optional[int]) -> InlineKeyboardMarkup:
+    """
+    Build the filter and navigation keyboard of a users ("u") or chats ("c") list page.
+
+    Callback data is ``bot:list:<table>:<filter>[:<n|p>:<key>]``, where n/p pages
+    after/before the primary key ``key``.
+    """
+    messages = Messages(language=language)
+
+    def button(text: str, token: str) -> InlineKeyboardButton:
+        mark = "• " if token == filter_token else ""
+        return InlineKeyboardButton(text=f"{mark}{text}", callback_data=f"bot:list:{table}:{token}")
+
+    buttons = [
+        [
+            button(messages.list_filter_all, "all"),
+            button(messages.list_filter_active, "act"),
+            button(messages.list_filter_banned, "ban")
+        ],
+        [button(lang, f"l.{lang}") for lang in messages.languages()]
+    ]
+    if table == "c":
+        buttons.append([button(chat_type, f"t.{chat_type}") for chat_type in LIST_CHAT_TYPES])
+
+    navigation = []
+    if prev_cursor is not None:
+        navigation.append(InlineKeyboardButton(text=messages.list_prev_button,
+                                               callback_data=f"bot:list:{table}:{filter_token}:p:{prev_cursor}"))
+    if next_cursor is not None:
+        navigation.append(InlineKeyboardButton(text=messages.list_next_button,
+                                               callback_data=f"bot:list:{table}:{filter_token}:n:{next_cursor}"))
+    if navigation:
+        buttons.append(navigation)
+    buttons.append([InlineKeyboardButton(text=messages.back_button, callback_data="bot:back")])
+    return InlineKeyboardMarkup(buttons)
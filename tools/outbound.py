@@ -0,0 +1,378 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Iterator, Optional, Set, Tuple
+from pyrogram import Client
+from pyrogram.errors import FloodWait
+from tools.logger import logger
+from tools.rate_limit import TokenBucket
+
+
+OUTBOUND_SCHEDULER = os.getenv("OUTBOUND_SCHEDULER", "true").lower() in ("1", "true", "yes")
+# Requests per second to Telegram across all chats
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", 30))
+# Requests per second to one private chat, and per minute to one group or channel
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", 1))
+OUTBOUND_GROUP_RATE = float(os.getenv("OUTBOUND_GROUP_RATE", 20))
+# Requests a chat may burst before its rate applies
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", 3))
+# Longer FloodWaits are raised to the caller instead of being waited out
+OUTBOUND_MAX_FLOOD_WAIT = int(os.getenv("OUTBOUND_MAX_FLOOD_WAIT", 60))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", 3))
+
+# Client methods that send to or edit in a chat; all take chat_id first
+OUTBOUND_METHODS = (
+    "send_message", "send_photo", "send_document", "send_video", "send_audio", "send_voice",
+    "send_animation", "send_sticker", "send_media_group", "send_location", "send_contact", "send_poll",
+    "copy_message", "forward_messages", "edit_message_text", "edit_message_caption",
+    "edit_message_media", "edit_message_reply_markup",
+)
+
+
+# Set by callers that handle FloodWait themselves (e.g. the broadcaster pausing all its workers)
+_raise_flood_wait: ContextVar[bool] = ContextVar("raise_flood_wait", default=False)
+
+
+# Set in the dispatcher's update workers, so a throttled chat never holds up the other chats of a worker
+_handler_path: ContextVar[bool] = ContextVar("handler_path", default=False)
+
+
+def set_handler_path(enabled: bool) -> None:
+    """Mark the current task as one that runs update handlers, or, with False, as a background sender."""
+    _handler_path.set(enabled)
+
+
+@contextmanager
+def awaiting_sends() -> Iterator[None]:
+    """Within this block, sends wait for the rate limits even on the handler path (for handlers that use the result)."""
+    token = _handler_path.set(False)
+    try:
+        yield
+    finally:
+        _handler_path.reset(token)
+
+
+@contextmanager
+def raising_flood_wait() -> Iterator[None]:
+    """Within this block, a FloodWait is raised to the caller at once instead of being retried."""
+    token = _raise_flood_wait.set(True)
+    try:
+        yield
+    finally:
+        _raise_flood_wait.reset(token)
+
+
+class OutboundClosed(RuntimeError):
+    """Raised to the callers of requests still queued or in flight when the scheduler is closed."""
+
+
+class _Request:
+    __slots__ = ("future", "call", "enqueued_at", "attempts", "raise_flood_wait")
+
+    def __init__(self, future: asyncio.Future, call: Callable[[], Awaitable[Any]], raise_flood_wait: bool):
+        self.future = future
+        self.call = call
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+        self.raise_flood_wait = raise_flood_wait
+
+
+class OutboundScheduler:
+    """
+    Rate-limit every send and edit of a client, globally and per chat.
+
+    Requests go to a per-chat FIFO queue and each chat has at most one request
+    in flight, so requests of one chat reach Telegram in order. A dispatcher
+    serves the chats with pending requests round-robin, taking one token from
+    the global bucket and one from the chat's bucket per request. Groups and
+    channels get the stricter per-minute rate. A busy group therefore waits on
+    its own bucket while other chats keep being served. A FloodWait pauses the
+    chat that got it, and the request is retried first after the pause, unless
+    the caller asked for it with ``raising_flood_wait``. When nothing is queued
+    and both buckets have a token, the request is sent right away.
+
+    On the handler path (see ``set_handler_path``) nothing is waited for: a
+    request that cannot be sent right away is queued and ``None`` is returned
+    at once, and a FloodWait is raised to the handler.
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, group_rate_per_minute: float, chat_burst: float,
+                 max_flood_wait: int, max_retries: int):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate_per_minute / 60
+        self.chat_burst = chat_burst
+        self.max_flood_wait = max_flood_wait
+        self.max_retries = max_retries
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._queues: Dict[Hashable, Deque[_Request]] = {}
+        # Chats with a request being sent; they leave the ring until it completes
+        self._inflight: Set[Hashable] = set()
+        # Chats with pending requests and nothing in flight, in round-robin order
+        self._ring: Deque[Hashable] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executing: Set[asyncio.Task] = set()
+        self._closed = False
+        self._last_sweep = time.monotonic()
+        self.sent = 0
+        self.queued = 0
+        self.detached = 0
+        self.flood_waits = 0
+        self.retries = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._max_latency = 0.0
+
+    def _bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            bucket = TokenBucket(self.group_rate if is_group else self.chat_rate, self.chat_burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _sweep(self) -> None:
+        """Forget the buckets of idle chats; a full bucket behaves exactly like a new one."""
+        now = time.monotonic()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for chat_id in [chat_id for chat_id, bucket in self._buckets.items()
+                        if chat_id not in self._queues and chat_id not in self._inflight
+                        and bucket.delay(bucket.capacity) == 0]:
+            del self._buckets[chat_id]
+
+    async def submit(self, chat_id: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run call() once the global and chat rate limits allow it, and return its result.
+
+        On the handler path, a call that has to wait is queued and None is returned without waiting.
+        """
+        if self._closed:
+            # Shutting down: nothing serves the queues any more
+            return await call()
+        self._sweep()
+        handler_path = _handler_path.get()
+        request = _Request(asyncio.get_running_loop().create_future(), call,
+                           _raise_flood_wait.get() or handler_path)
+        bucket = self._bucket(chat_id)
+        if (chat_id not in self._queues and chat_id not in self._inflight and not self._ring
+                and bucket.delay() == 0 and self.global_bucket.try_acquire()):
+            bucket.try_acquire()
+            self._record_latency(0.0)
+            self._inflight.add(chat_id)
+            request.attempts = 1
+            try:
+                return await self._call(chat_id, call)
+            except FloodWait as e:
+                if not self._should_retry(request, e):
+                    raise
+                # Queue it first for its chat, to be retried after the pause
+                self.retries += 1
+                self._enqueue(chat_id, request, first=True)
+            finally:
+                self._release(chat_id)
+        else:
+            if handler_path:
+                # Nobody waits for it, so a FloodWait is retried in the background
+                request.raise_flood_wait = _raise_flood_wait.get()
+                request.future.add_done_callback(self._detached_done)
+                self.detached += 1
+            self._enqueue(chat_id, request)
+        self.queued += 1
+        if handler_path:
+            return None
+        return await request.future
+
+    @staticmethod
+    def _detached_done(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Queued handler send failed: {future.exception()}")
+
+    def _should_retry(self, request: _Request, error: FloodWait) -> bool:
+        return (not request.raise_flood_wait and error.value <= self.max_flood_wait
+                and request.attempts <= self.max_retries)
+
+    def _enqueue(self, chat_id: Hashable, request: _Request, first: bool = False) -> None:
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            if chat_id not in self._inflight:
+                self._ring.append(chat_id)
+        if first:
+            queue.appendleft(request)
+        else:
+            queue.append(request)
+        self._wake()
+
+    def _release(self, chat_id: Hashable) -> None:
+        """Mark a chat's request as completed and make its next queued request eligible."""
+        self._inflight.discard(chat_id)
+        if chat_id in self._queues:
+            self._ring.append(chat_id)
+            self._wake()
+
+    def _wake(self) -> None:
+        if self._closed:
+            return
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    async def _call(self, chat_id: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await call()
+        except FloodWait as e:
+            self.flood_waits += 1
+            self._bucket(chat_id).pause(e.value)
+            logger.warning(f"FloodWait of {e.value}s for chat {chat_id}, pausing its outbound queue")
+            raise
+        self.sent += 1
+        return result
+
+    def _next_ready(self) -> Tuple[Optional[Hashable], float]:
+        """Take a token from the next chat in round-robin order that has one; else return the shortest wait."""
+        wait = None
+        for _ in range(len(self._ring)):
+            chat_id = self._ring[0]
+            bucket = self._bucket(chat_id)
+            if bucket.try_acquire():
+                return chat_id, 0.0
+            self._ring.rotate(-1)
+            delay = bucket.delay()
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait if wait is not None else 0.0
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ring:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self.global_bucket.acquire()
+            chat_id, wait = self._next_ready()
+            while chat_id is None:
+                # Wake early if a request for a chat with tokens left arrives meanwhile
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(wait, 0.001))
+                except asyncio.TimeoutError:
+                    pass
+                chat_id, wait = self._next_ready()
+
+            self._ring.popleft()
+            queue = self._queues[chat_id]
+            request = queue.popleft()
+            if not queue:
+                del self._queues[chat_id]
+            if request.future.done():
+                # The caller was cancelled while the request was queued
+                if chat_id in self._queues:
+                    self._ring.append(chat_id)
+                continue
+            if request.attempts == 0:
+                self._record_latency(time.monotonic() - request.enqueued_at)
+            self._inflight.add(chat_id)
+            task = asyncio.get_running_loop().create_task(self._execute(chat_id, request))
+            self._executing.add(task)
+            task.add_done_callback(self._executing.discard)
+
+    async def _execute(self, chat_id: Hashable, request: _Request) -> None:
+        request.attempts += 1
+        try:
+            result = await self._call(chat_id, request.call)
+        except FloodWait as e:
+            if self._should_retry(request, e):
+                self.retries += 1
+                self._enqueue(chat_id, request, first=True)
+            elif not request.future.done():
+                request.future.set_exception(e)
+        except asyncio.CancelledError:
+            # A CancelledError would escape the handler awaiting the future and kill its worker
+            if not request.future.done():
+                request.future.set_exception(OutboundClosed("Outbound scheduler closed while sending"))
+            raise
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+        else:
+            if not request.future.done():
+                request.future.set_result(result)
+        finally:
+            self._release(chat_id)
+
+    async def close(self) -> None:
+        """
+        Stop the dispatcher and the sends in flight, and fail every queued request with OutboundClosed.
+
+        Call it after the client has stopped dispatching updates; later requests are sent directly.
+        """
+        self._closed = True
+        tasks = list(self._executing)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in self._queues.values():
+            for request in queue:
+                if not request.future.done():
+                    request.future.set_exception(OutboundClosed("Outbound scheduler closed before sending"))
+        self._queues.clear()
+        self._ring.clear()
+        self._inflight.clear()
+        self._task = None
+
+    def _record_latency(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._max_latency = max(self._max_latency, latency)
+
+    def wrap(self, method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Route a client method whose first argument is chat_id through the scheduler."""
+        @wraps(method)
+        async def wrapper(*args, **kwargs):
+            chat_id = kwargs["chat_id"] if "chat_id" in kwargs else args[0]
+            return await self.submit(chat_id, lambda: method(*args, **kwargs))
+        return wrapper
+
+    def install(self, client: Client) -> None:
+        """Wrap the client's send and edit methods, so Message.reply and friends are scheduled too."""
+        for name in OUTBOUND_METHODS:
+            setattr(client, name, self.wrap(getattr(client, name)))
+        logger.info(f"Outbound scheduler installed on {len(OUTBOUND_METHODS)} client methods")
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else 0.0
+
+        return {
+            "sent": self.sent,
+            "queued": self.queued,
+            "detached": self.detached,
+            "pending": sum(len(queue) for queue in self._queues.values()),
+            "pending_chats": len(self._queues),
+            "in_flight": len(self._inflight),
+            "flood_waits": self.flood_waits,
+            "retries": self.retries,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            "latency_max_ms": round(self._max_latency * 1000, 1),
+            "global_bucket": self.global_bucket.stats(),
+        }
+
+
+outbound = OutboundScheduler(
+    global_rate=OUTBOUND_GLOBAL_RATE,
+    chat_rate=OUTBOUND_CHAT_RATE,
+    group_rate_per_minute=OUTBOUND_GROUP_RATE,
+    chat_burst=OUTBOUND_CHAT_BURST,
+    max_flood_wait=OUTBOUND_MAX_FLOOD_WAIT,
+    max_retries=OUTBOUND_MAX_RETRIES
+)
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    Token bucket shared by coroutines: ``rate`` tokens per second, bursts of up to ``capacity``.
+
+    Waiters are served in arrival order. ``pause`` empties the bucket and blocks
+    every waiter until the pause ends, which is how a FloodWait from Telegram is
+    applied to all senders instead of only the one that received it.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = max(1.0, capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+        self.pauses = 0
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def delay(self, tokens: float = 1) -> float:
+        """Seconds until ``tokens`` can be taken, 0 if they are available now."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now + tokens / self.rate
+        self._refill(now)
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take ``tokens`` without waiting; False if the bucket is paused or too empty."""
+        if self._lock.locked() or self.delay(tokens) > 0:
+            return False
+        self._tokens -= tokens
+        self.acquired += 1
+        return True
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """Wait until ``tokens`` are available, take them and return the seconds waited."""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                wait = self.delay(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self._tokens -= tokens
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.waited += waited
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """Block all acquisitions for ``seconds`` (e.g. the value of a FloodWait)."""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self._tokens = 0.0
+            # No tokens accumulate while paused
+            self._updated = until
+            self.pauses += 1
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate": self.rate,
+            "acquired": self.acquired,
+            "avg_wait_ms": round(self.waited / self.acquired * 1000, 2) if self.acquired else 0.0,
+            "pauses": self.pauses,
+            "paused": self.paused,
+        }
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _LeaderCancelled(Exception):
+    """Set on a shared call when the caller running it is cancelled, so the others run it again."""
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight coroutine.
+
+    The first caller for a key starts the work; callers arriving while it is
+    running await the same result (or exception) instead of starting their own.
+    If the first caller is cancelled, the waiting callers are not: one of them
+    runs the call again.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executed = 0
+        self.deduplicated = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key unless a call for key is already running, and return its result."""
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.deduplicated += 1
+            while future is not None:
+                try:
+                    return await asyncio.shield(future)
+                except _LeaderCancelled:
+                    future = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+        }
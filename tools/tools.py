@@ -1,15 +1,20 @@
+import csv
 import re
 from pyrogram import Client
 from pyrogram.enums import ChatType
 from pyrogram.types import CallbackQuery, Message
-from database import Chats, Users, AdminsPermissions, BotSettings
+from database import Chats, ChatRecord, Users, AdminsPermissions, BotSettings
 from tools.enums import AccessPermission
 from tools.enums import Messages, PrivilegesMessages
 from functools import wraps
 from tools.logger import logger
-from typing import Union
+from typing import List, Tuple, Union
 import os
 from tools.inline_keyboards import select_language_buttons
+from tools.context import get_context
+from tools.conversation import conversations
+from tools.ban_gate import ban_gate_handlers
+from tools.dispatcher import sharded_dispatcher
 from pyrogram.filters import create, Filter
 
 
@@ -25,6 +30,37 @@ def is_valid_username(username) -> bool:
     return bool(re.match(r"^@[a-zA-Z][a-zA-Z0-9_]{3,30}[a-zA-Z0-9]$", str(username)))
 
 
+def parse_id_list(text: str, csv_format: bool = False) -> Tuple[List[int], List[int], int]:
+    """
+    Extract user and chat IDs from pasted text or an uploaded .txt/.csv file.
+
+    Text is split on whitespace, commas and semicolons. For CSV, IDs are read from
+    the user_id/chat_id/id column if the header has one, else from the first column.
+
+    Returns:
+        Tuple[List[int], List[int], int]: Unique user IDs, unique chat IDs and the number of invalid entries
+    """
+    if csv_format:
+        rows = [row for row in csv.reader(text.splitlines()) if row]
+        column = 0
+        if rows and not (is_valid_user_id(rows[0][0].strip()) or is_valid_chat_id(rows[0][0].strip())):
+            header = [cell.strip().lower() for cell in rows.pop(0)]
+            column = next((header.index(name) for name in ("user_id", "chat_id", "id") if name in header), 0)
+        tokens = [row[column].strip() if column < len(row) else "" for row in rows]
+    else:
+        tokens = [token for token in re.split(r"[\s,;]+", text) if token]
+
+    user_ids, chat_ids, invalid = {}, {}, 0
+    for token in tokens:
+        if is_valid_user_id(token):
+            user_ids[int(token)] = None
+        elif is_valid_chat_id(token):
+            chat_ids[int(token)] = None
+        else:
+            invalid += 1
+    return list(user_ids), list(chat_ids), invalid
+
+
 def is_admin_message(permission_require="can_restrict_members"):
     """
     Check if a message or callback query is from an admin of the chat and has the required permission.
@@ -48,21 +84,17 @@ def is_admin_message(permission_require="can_restrict_members"):
                 access = await AdminsPermissions.is_admin(client, chat_id, user_id, permission_require)
                 if access == AccessPermission.ALLOW:
                     return await func(client, message, *args, **kwargs)
-                elif access == AccessPermission.DENY:
-                    chat = await Chats.get(chat_id=chat_id)
-                    language = chat.get("language") or os.getenv("DEFAULT_LANGUAGE") or "he"
-                    miss_permission = PrivilegesMessages(language=language).__getattr__(permission_require)
-                    await message.reply(Messages(language=language).unauthorized_admin.format(miss_permission))
-                    return
-                elif access == AccessPermission.BOT_NOT_ADMIN:
-                    chat = await Chats.get(chat_id=chat_id)
-                    language = chat.get("language") or os.getenv("DEFAULT_LANGUAGE") or "he"
-                    await message.reply(Messages(language=language).bot_not_admin)
-                    return
-                elif access == AccessPermission.CHAT_NOT_FOUND:
-                    chat = await Chats.get(chat_id=chat_id)
-                    language = chat.get("language") or os.getenv("DEFAULT_LANGUAGE") or "he"
-                    await message.reply(Messages(language=language).chat_not_found)
+                if access in (AccessPermission.DENY, AccessPermission.BOT_NOT_ADMIN, AccessPermission.CHAT_NOT_FOUND):
+                    chat = await get_context(message).chat(chat_id)
+                    language = (chat and chat.language) or os.getenv("DEFAULT_LANGUAGE") or "he"
+                    messages = Messages(language=language)
+                    if access == AccessPermission.DENY:
+                        miss_permission = PrivilegesMessages(language=language).__getattr__(permission_require)
+                        await message.reply(messages.unauthorized_admin.format(miss_permission))
+                    elif access == AccessPermission.BOT_NOT_ADMIN:
+                        await message.reply(messages.bot_not_admin)
+                    else:
+                        await message.reply(messages.chat_not_found)
                     return
                 return
         return wrapper
@@ -80,34 +112,36 @@ def with_language(func):
             raise ValueError("Invalid Object, expected Message or CallbackQuery only")
 
         default_language = os.getenv("DEFAULT_LANGUAGE") or "he"
+        context = get_context(msg)
 
         if chat_type in [ChatType.GROUP, ChatType.SUPERGROUP]:
             chat_id = msg.chat.id
-            chat = await Chats.get(chat_id=chat_id)
+            chat = await context.chat(chat_id)
             if not chat:
-                await Chats.create(chat_id=chat_id,
-                             chat_type=chat_type,
-                             chat_title=msg.chat.title)
-                chat = await Chats.get(chat_id=chat_id)
-            if isinstance(chat, dict) and chat.get("is_banned"):
+                chat = ChatRecord.from_row(await Chats.create(chat_id=chat_id,
+                                                              chat_type=chat_type.value,
+                                                              chat_title=msg.chat.title))
+                context.set_chat(chat_id, chat)
+            if chat.is_banned:
                 await msg.chat.leave()
                 return
-            language = chat.get("language") or default_language
+            language = chat.language or default_language
         elif chat_type == ChatType.PRIVATE:
             user_id = msg.from_user.id
-            user = await Users.get(user_id=user_id)
+            user = await context.user(user_id)
             if not user:
                 await Users.create(user_id=user_id,
                              username=msg.from_user.username,
                              full_name=msg.from_user.full_name,
-                             is_active=True)
-                user = await Users.get(user_id=user_id)
+                             is_active=True,
+                             deferred=True)
+                context.forget_user(user_id)
                 await msg.reply(Messages(language=default_language).select_language,
                                 reply_markup=select_language_buttons())
                 return
-            if isinstance(user, dict) and user.get("is_banned"):
+            if user.is_banned:
                 return
-            language = user.get("language") or default_language
+            language = user.language or default_language
         else:
             raise TypeError("Invalid chat type only groups, supergroups or private allowd")
         try:
@@ -130,11 +164,13 @@ def chat_settings():
             if message.chat.type not in [ChatType.GROUP, ChatType.SUPERGROUP]:
                 logger.warning(f"wrapper work only in groups")
                 return
-            chat = await Chats.get(chat_id=message.chat.id)
+            context = get_context(msg_or_cq)
+            chat = await context.chat_row(message.chat.id)
             if not chat:
                 chat = await Chats.create(chat_id=message.chat.id,
                                     chat_type=message.chat.type.value,
                                     chat_title=message.chat.title)
+                context.forget_chat(message.chat.id)
             try:
                 return await func(client, msg_or_cq, chat)
             except Exception as e:
@@ -157,6 +193,8 @@ def owner_only(func):
 
             if user_id != (await BotSettings.get_settings()).owner_id:
                 if isinstance(update, CallbackQuery):
+                    user = await get_context(update).user(user_id)
+                    language = (user and user.language) or language
                     await update.answer(Messages(language=language).unauthorized_user, show_alert=True)
                 return
             # Call the original function
@@ -172,11 +210,18 @@ def owner_only(func):
 
 def register_handlers(app: Client, *handler_lists: list) -> None:
     """Register multiple lists of handlers with the client.
+
+    The ban gate is registered first, in group -1, so updates from banned
+    users and chats never reach these handlers. The sharded dispatcher is
+    installed too, so updates of one chat are handled in order.
     
     Args:
         app: The Pyrogram Client instance
         *handler_lists: Variable number of handler lists to register
     """
+    sharded_dispatcher.install(app)
+    for handler in ban_gate_handlers:
+        app.add_handler(handler, group=-1)
     count_handlers = 0
     for handler_list in handler_lists:
         if not isinstance(handler_list, list):
@@ -190,10 +235,7 @@ def register_handlers(app: Client, *handler_lists: list) -> None:
 def wait_input_filter(wait_input: str) -> Filter:
     """Filter to check if the bot is waiting for input from the user"""
     async def func(_, __, m: Message) -> bool:
-        if m.chat.type == ChatType.PRIVATE:
-            user = await Users.get(user_id=m.from_user.id)
-            if not user:
-                return False
-            return user.get("wait_input") == wait_input
+        if m.chat.type == ChatType.PRIVATE and m.from_user:
+            return conversations.get(m.from_user.id) == wait_input
         return False
     return create(func=func, name=f"WaitInput_{wait_input}")